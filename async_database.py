@@ -0,0 +1,103 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from database_manager import CalendarChanges, DatabaseManager, HoursSummary, ProvisionReport
+from day_store import Day, YearStore
+from earnings_index import EarningsIndex
+from recurring_expenses import ExpenseSchedule
+
+
+class AsyncDatabaseManager:
+    """
+    Awaitable facade over a DatabaseManager. Every call runs on one dedicated db thread so the
+    Textual event loop never blocks on disk. Identical reads that are already queued or running
+    are collapsed, so every caller asking for the same month awaits a single query.
+    """
+
+    def __init__(self, db_manager: DatabaseManager) -> None:
+        self.db_manager = db_manager
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="timewizard-db")
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Runs func(*args) on the db thread and waits for its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._in_context(func, *args))
+
+    async def _run_collapsed(self, key: Hashable, func: Callable[..., Any], *args: Any) -> Any:
+        """Runs func on the db thread unless a call with the same key is already pending."""
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self._in_context(func, *args))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the shared query for the others.
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _in_context(func: Callable[..., Any], *args: Any) -> Callable[[], Any]:
+        """Binds func to the caller's context so traced call sites follow it onto the db thread."""
+        return functools.partial(contextvars.copy_context().run, func, *args)
+
+    async def get_days(self, dates: list[str]) -> Optional[list[Day]]:
+        return await self._run_collapsed(("get_days", tuple(dates)), self.db_manager.get_days, dates)
+
+    async def get_days_range(self, start: str, end: str) -> Optional[list[Day]]:
+        return await self._run_collapsed(
+            ("get_days_range", start, end), self.db_manager.get_days_range, start, end
+        )
+
+    async def get_year_store(self, year: int) -> Optional[YearStore]:
+        return await self._run_collapsed(("get_year_store", year), self.db_manager.get_year_store, year)
+
+    async def get_earnings_index(self, job_name: Optional[str] = None) -> Optional[EarningsIndex]:
+        return await self._run_collapsed(
+            ("get_earnings_index", job_name), self.db_manager.get_earnings_index, job_name
+        )
+
+    async def get_shift_totals(self, start: str, end: str) -> dict[str, tuple[float, float]]:
+        return await self._run_collapsed(
+            ("get_shift_totals", start, end), self.db_manager.get_shift_totals, start, end
+        )
+
+    async def get_job(self, job_name: str) -> Optional[dict[str, str | int | float]]:
+        return await self._run_collapsed(("get_job", job_name), self.db_manager.get_job, job_name)
+
+    async def update_day(self, date_string: str, column: str, value: str | int | bool) -> None:
+        await self.run(self.db_manager.update_day, date_string, column, value)
+
+    async def year_exists(self, year: int) -> bool:
+        return await self._run_collapsed(("year_exists", year), self.db_manager.year_exists, year)
+
+    async def insert_year(self, year: int) -> None:
+        await self._run_collapsed(("insert_year", year), self.db_manager.insert_year, year)
+
+    async def insert_years(self, years: Iterable[int]) -> Optional[ProvisionReport]:
+        years = tuple(sorted(set(years)))
+        return await self._run_collapsed(("insert_years", years), self.db_manager.insert_years, years)
+
+    async def get_summaries(self, level: str, years: Iterable[int]) -> dict[str, HoursSummary]:
+        years = tuple(sorted(set(years)))
+        return await self._run_collapsed(
+            ("get_summaries", level, years), self.db_manager.get_summaries, level, years
+        )
+
+    async def get_expense_schedule(self) -> ExpenseSchedule:
+        """Loads the expense schedule on the db thread if it hasn't been loaded yet."""
+        return await self._run_collapsed(("get_expense_schedule",), lambda: self.db_manager.expense_schedule)
+
+    async def poll_changes(self) -> Optional[CalendarChanges]:
+        return await self._run_collapsed(("poll_changes",), self.db_manager.poll_changes)
+
+    async def flush(self) -> int:
+        # Not collapsed: joining a flush already running would return before updates queued
+        # after it started were written.
+        return await self.run(self.db_manager.flush)
+
+    def close(self) -> None:
+        """Waits for queued work to finish, then stops the db thread."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,504 @@
+"""
+Benchmarks for the database and payroll hot paths, run against a temporary db.
+
+Run from the repo root:
+    python -m benchmarks.bench --output bench.json
+    python -m benchmarks.bench --output new.json --baseline bench.json
+
+With --baseline, any benchmark whose median is more than --threshold slower than the baseline
+is reported and the run exits non-zero. The run also exits non-zero if startup goes over
+STARTUP_BUDGET_MS or opens the db before the main screen is drawn. The report also records how
+much memory three years of calendar rows take as dicts, Day records and YearStores.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from database_manager import DatabaseManager
+from day_store import Day, YearStore
+from pay_calendar import PayCalendar
+from payroll import PayrollEngine
+from optimizer import Constraints, optimize
+from scenarios import load_base, scenario_grid, simulate
+from transfer import import_table, write_ics
+from withholding import DEFAULT_WITHHOLDING, PERIODS_PER_YEAR, PayLedger, WithholdingEngine
+
+BENCH_YEAR = 2025
+# Import of timewizard through to the first paint of MainScreen.
+STARTUP_BUDGET_MS = 1000.0
+JOB = ("unc_nursing", 54.50, 90.65, 10.00, 5.00, 15.00)
+PAY_CALENDAR = PayCalendar(anchor_pay_day=date(2025, 1, 14), cadence="biweekly", lag_days=10)
+
+BENCHMARKS: dict[str, Callable[["BenchContext"], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """
+    Registers a benchmark. The decorated function receives the context, does any untimed setup
+    and returns the callable to time. A callable that measures itself returns its elapsed
+    milliseconds, which are recorded instead of the wall clock time of the call.
+    """
+    def register(setup: Callable[["BenchContext"], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class BenchContext:
+    """Owns the temporary directory and builds fresh, provisioned databases inside it."""
+
+    def __init__(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="timewizard-bench-")
+        self._count = 0
+
+    def new_db_path(self) -> str:
+        self._count += 1
+        return os.path.join(self.directory, f"bench-{self._count}.db")
+
+    def new_manager(self, years: tuple[int, ...] = (BENCH_YEAR,), **kwargs) -> DatabaseManager:
+        """Returns a manager over a fresh db with tables, the default job and the given years."""
+        db_manager = DatabaseManager(self.new_db_path(), **kwargs)
+        db_manager.insert_job(*JOB)
+        db_manager.insert_years(years)
+        return db_manager
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+@benchmark("insert_year")
+def bench_insert_year(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager(years=())
+    years = iter(range(1000, 9000))
+    return lambda: db_manager.insert_year(next(years))
+
+
+@benchmark("insert_years_century")
+def bench_insert_years_century(context: BenchContext) -> Callable[[], object]:
+    def run() -> None:
+        db_manager = context.new_manager(years=())
+        db_manager.insert_years(range(2000, 2100))
+        db_manager.close()
+    return run
+
+
+@benchmark("get_days_month_cold")
+def bench_get_days_month_cold(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager()
+    def run() -> None:
+        db_manager.cache.clear()
+        db_manager.get_days_range("2025-02-23", "2025-04-05")
+    return run
+
+
+@benchmark("get_days_month_warm")
+def bench_get_days_month_warm(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager()
+    db_manager.get_days_range("2025-02-23", "2025-04-05")
+    return lambda: db_manager.get_days_range("2025-02-23", "2025-04-05")
+
+
+@benchmark("get_days_pay_period_cold")
+def bench_get_days_pay_period_cold(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager()
+    dates = [str(date(2025, 3, 2) + timedelta(days=offset)) for offset in range(14)]
+    def run() -> None:
+        db_manager.cache.clear()
+        db_manager.get_days(dates)
+    return run
+
+
+@benchmark("update_day_burst_strict")
+def bench_update_day_burst_strict(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager()
+    def run() -> None:
+        for day in range(1, 32):
+            db_manager.update_day(f"2025-03-{day:02}", "is_working", day % 2 == 0)
+    return run
+
+
+@benchmark("update_day_burst_write_behind")
+def bench_update_day_burst_write_behind(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager(write_behind=True)
+    def run() -> None:
+        for day in range(1, 32):
+            db_manager.update_day(f"2025-03-{day:02}", "is_working", day % 2 == 0)
+        db_manager.flush()
+    return run
+
+
+@benchmark("year_exists")
+def bench_year_exists(context: BenchContext) -> Callable[[], object]:
+    def run() -> None:
+        # A fresh manager each time so the known year memo doesn't hide the query.
+        db_manager = DatabaseManager(db_path)
+        db_manager.year_exists(BENCH_YEAR)
+        db_manager.close()
+    db_path = context.new_manager().db_path
+    return run
+
+
+@benchmark("calculate_pay_day_pay_month")
+def bench_calculate_pay_day_pay_month(context: BenchContext) -> Callable[[], object]:
+    """
+    CalendarView.calculate_pay_day_pay for a month on a mounted work schedule, with a cold
+    payroll engine, ledgers and month cache each call. Returns the mean per call.
+    """
+    from screens.work_schedule import CalendarView
+    from timewizard import TimeWizardApp
+
+    today = date.today()
+    db_manager = context.new_manager(years=tuple(sorted({BENCH_YEAR, today.year - 1, today.year, today.year + 1})))
+    for day in range(1, 32):
+        db_manager.update_day(f"{BENCH_YEAR}-03-{day:02}", "is_working", day % 3 == 0)
+    db_path = db_manager.db_path
+    calls = 10
+
+    async def session() -> float:
+        app = TimeWizardApp(db_path=db_path)
+        async with app.run_test(size=(140, 60)) as pilot:
+            await pilot.press("w")
+            await pilot.pause()
+            await app.workers.wait_for_complete()
+            view = app.screen.query_one(CalendarView)
+            view.selected_year, view.selected_month_int = BENCH_YEAR, 3
+            elapsed = 0.0
+            for _ in range(calls):
+                view.payroll = PayrollEngine(view.job)
+                view.ledgers = {}
+                view.db_manager.cache.clear()
+                start = time.perf_counter()
+                await view.calculate_pay_day_pay()
+                elapsed += time.perf_counter() - start
+            return elapsed * 1000 / calls
+
+    previous_directory = os.getcwd()
+    def run() -> float:
+        # The app resolves its CSS paths relative to the repo root.
+        os.chdir(REPO_ROOT)
+        try:
+            return asyncio.run(session())
+        finally:
+            os.chdir(previous_directory)
+    return run
+
+
+@benchmark("payroll_toggle")
+def bench_payroll_toggle(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager()
+    pay_days = PAY_CALENDAR.pay_days_in_month(BENCH_YEAR, 3)
+    payroll = PayrollEngine(db_manager.get_job(JOB[0]))
+    payroll.add_periods(pay_days, db_manager.get_days_range("2025-02-01", "2025-03-31"))
+    state = {"working": False}
+    def run() -> None:
+        state["working"] = not state["working"]
+        payroll.set_working("2025-03-04", state["working"])
+        payroll.month_totals(pay_days)
+    return run
+
+
+@benchmark("summaries_three_years")
+def bench_summaries_three_years(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager(years=(BENCH_YEAR - 1, BENCH_YEAR, BENCH_YEAR + 1))
+    for day in range(1, 32):
+        db_manager.update_day(f"{BENCH_YEAR}-03-{day:02}", "is_working", day % 3 == 0)
+    years = (BENCH_YEAR - 1, BENCH_YEAR, BENCH_YEAR + 1)
+    def run() -> None:
+        db_manager.get_summaries("month", years)
+        db_manager.get_summaries("year", years)
+    return run
+
+
+@benchmark("year_store_period_totals")
+def bench_year_store_period_totals(context: BenchContext) -> Callable[[], object]:
+    db_manager = context.new_manager()
+    for day in range(1, 32):
+        db_manager.update_day(f"{BENCH_YEAR}-03-{day:02}", "is_working", day % 3 == 0)
+    store = db_manager.get_year_store(BENCH_YEAR)
+    periods = PAY_CALENDAR.periods_for_year(BENCH_YEAR)
+    def run() -> None:
+        for period in periods:
+            store.week_totals(period.start, period.end)
+    return run
+
+
+@benchmark("earnings_index_decade_toggle")
+def bench_earnings_index_decade_toggle(context: BenchContext) -> Callable[[], object]:
+    """Toggle a day, then total a decade and the year to date from the earnings index."""
+    db_manager = context.new_manager(years=tuple(range(BENCH_YEAR - 9, BENCH_YEAR + 1)))
+    index = db_manager.get_earnings_index()
+    state = {"working": False}
+    def run() -> None:
+        state["working"] = not state["working"]
+        db_manager.update_day(f"{BENCH_YEAR}-03-04", "is_working", state["working"])
+        index.totals(date(BENCH_YEAR - 9, 1, 1), date(BENCH_YEAR, 12, 31))
+        index.year_to_date(date(BENCH_YEAR, 6, 30))
+    return run
+
+
+@benchmark("withholding_ledger_toggle")
+def bench_withholding_ledger_toggle(context: BenchContext) -> Callable[[], object]:
+    """Change one paycheck, then read the withholding for a month's paydays and the year."""
+    pay_days = [period.pay_day for period in PAY_CALENDAR.periods_for_year(BENCH_YEAR)]
+    ledger = PayLedger(
+        WithholdingEngine(DEFAULT_WITHHOLDING, PERIODS_PER_YEAR[PAY_CALENDAR.cadence]),
+        pay_days,
+        {pay_day: 3000.0 for pay_day in pay_days},
+    )
+    month = PAY_CALENDAR.pay_days_in_month(BENCH_YEAR, 3)
+    state = {"gross": 3000.0}
+    def run() -> None:
+        state["gross"] = 6000.0 if state["gross"] == 3000.0 else 3000.0
+        ledger.set_gross(next(iter(month)), state["gross"])
+        ledger.total(month)
+        ledger.total(pay_days)
+    return run
+
+
+@benchmark("optimize_schedule_year")
+def bench_optimize_schedule_year(context: BenchContext) -> Callable[[], object]:
+    """Plan a year of shifts to an income target under weekly, run and day-off limits."""
+    db_manager = context.new_manager(years=(BENCH_YEAR - 1, BENCH_YEAR, BENCH_YEAR + 1))
+    for day in range(1, 32):
+        db_manager.update_day(f"{BENCH_YEAR}-03-{day:02}", "is_critical", day % 5 == 0)
+    pay_days = {
+        period.pay_day: (period.start, period.end) for period in db_manager.pay_calendar.periods_for_year(BENCH_YEAR)
+    }
+    constraints = Constraints(max_shifts_per_week=4, max_consecutive=3, weekdays_off=frozenset({6}))
+    def run() -> None:
+        optimize(db_manager, pay_days, constraints, target=60_000)
+    return run
+
+
+@benchmark("simulate_scenarios_year")
+def bench_simulate_scenarios_year(context: BenchContext) -> Callable[[], object]:
+    """Evaluate a grid of 160 schedule and rate scenarios over a year, in this process."""
+    db_manager = context.new_manager(years=(BENCH_YEAR - 1, BENCH_YEAR))
+    for day in range(1, 32):
+        db_manager.update_day(f"{BENCH_YEAR}-03-{day:02}", "is_working", day % 3 == 0)
+    base = load_base(db_manager, BENCH_YEAR)
+    grid = scenario_grid(
+        extra_shifts_per_week=range(4),
+        drop_weekdays=(frozenset(), frozenset({5, 6}), frozenset({0}), frozenset({4, 5, 6})),
+        add_weekdays=(frozenset(), frozenset({2})),
+        rate_multipliers=(0.95, 1.0, 1.03, 1.05, 1.1),
+    )
+    def run() -> None:
+        simulate(base, grid, workers=1)
+    return run
+
+
+@benchmark("import_shifts_three_years_ics")
+def bench_import_shifts_three_years_ics(context: BenchContext) -> Callable[[], object]:
+    """Import every other day of three years of shifts from an ics file into a fresh db."""
+    path = os.path.join(context.directory, "shifts.ics")
+    with open(path, "w", newline="") as file:
+        day = date(BENCH_YEAR - 2, 1, 1)
+        shifts = []
+        while day.year <= BENCH_YEAR:
+            shifts.append((JOB[0], f"{day} 07:00:00", f"{day} 19:00:00", 0, day.day % 5 == 0))
+            day += timedelta(days=2)
+        write_ics(shifts, file)
+    def run() -> float:
+        db_manager = context.new_manager(years=())
+        start = time.perf_counter()
+        import_table(db_manager, "shifts", path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        db_manager.close()
+        return elapsed_ms
+    return run
+
+
+@benchmark("work_schedule_pilot")
+def bench_work_schedule_pilot(context: BenchContext) -> Callable[[], object]:
+    """Headless WorkScheduleScreen session: three month switches and six switch toggles."""
+    from textual.widgets import Select, Switch
+    from timewizard import TimeWizardApp
+
+    today = date.today()
+    db_path = context.new_manager(years=(today.year - 1, today.year, today.year + 1)).db_path
+
+    async def settle(app, pilot) -> None:
+        await pilot.pause()
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+
+    async def session() -> None:
+        app = TimeWizardApp(db_path=db_path)
+        async with app.run_test(size=(140, 60)) as pilot:
+            await pilot.press("w")
+            await settle(app, pilot)
+            month_select = app.screen.query_one("#select-month", Select)
+            for month in ("January", "February", "March"):
+                month_select.value = month
+                await settle(app, pilot)
+            switches = [switch for switch in app.screen.query(Switch) if switch.display]
+            for switch in switches[8:14]:
+                switch.value = not switch.value
+                await settle(app, pilot)
+
+    previous_directory = os.getcwd()
+    def run() -> None:
+        # The app resolves its CSS paths relative to the repo root.
+        os.chdir(REPO_ROOT)
+        try:
+            asyncio.run(session())
+        finally:
+            os.chdir(previous_directory)
+    return run
+
+
+def run_startup_probe(context: BenchContext) -> dict:
+    """Runs the startup probe in a fresh interpreter against a db path that doesn't exist yet."""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", context.new_db_path()],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    if probe["db_opened"]:
+        raise RuntimeError("Startup opened the database before the main screen was drawn")
+    return probe
+
+
+@benchmark("startup_import")
+def bench_startup_import(context: BenchContext) -> Callable[[], object]:
+    return lambda: run_startup_probe(context)["import_ms"]
+
+
+@benchmark("startup_first_paint")
+def bench_startup_first_paint(context: BenchContext) -> Callable[[], object]:
+    return lambda: run_startup_probe(context)["first_paint_ms"]
+
+
+def measure_memory(years: tuple[int, ...] = (BENCH_YEAR - 1, BENCH_YEAR, BENCH_YEAR + 1)) -> dict[str, int]:
+    """
+    Bytes allocated to hold the given years of calendar rows as dicts (the old get_days form), as
+    Day records, and as YearStores.
+    """
+    context = BenchContext()
+    try:
+        db_manager = context.new_manager(years=years)
+        cursor = db_manager.cursor
+        cursor.execute("SELECT *, 0.0 AS worth FROM calendar ORDER BY date_string")
+        rows = cursor.fetchall()
+        column_names = [description[0] for description in cursor.description]
+        db_manager.close()
+
+        forms = {
+            "dict_rows": lambda: [dict(zip(column_names, row)) for row in rows],
+            "day_records": lambda: [Day.from_row(row) for row in rows],
+            "year_stores": lambda: [YearStore.from_days(year, rows) for year in years],
+        }
+        memory = {}
+        for name, build in forms.items():
+            tracemalloc.start()
+            held = build()
+            memory[f"{name}_bytes"] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del held
+        return memory
+    finally:
+        context.cleanup()
+
+
+SESSION_BENCHMARKS = {"calculate_pay_day_pay_month", "work_schedule_pilot", "startup_import", "startup_first_paint"}
+
+
+def time_benchmark(run: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Times run repeat times after one warm-up call, returning stats in milliseconds."""
+    run()
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        measured_ms = run()
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        samples.append(measured_ms if isinstance(measured_ms, float) else elapsed_ms)
+    return {
+        "repeat": repeat,
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "max_ms": max(samples),
+    }
+
+
+def run_benchmarks(names: list[str], repeat: int) -> dict[str, dict[str, float]]:
+    context = BenchContext()
+    results = {}
+    try:
+        for name in names:
+            # These start a whole app session each, so a handful of runs is plenty.
+            runs = min(repeat, 3) if name in SESSION_BENCHMARKS else repeat
+            results[name] = time_benchmark(BENCHMARKS[name](context), runs)
+            print(f"{name:<32} median {results[name]['median_ms']:>10.3f}ms", file=sys.stderr)
+    finally:
+        context.cleanup()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Returns a line for every benchmark whose median regressed past threshold."""
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["median_ms"]
+        new = stats["median_ms"]
+        if old > 0 and (new - old) / old > threshold:
+            regressions.append(f"{name}: {old:.3f}ms -> {new:.3f}ms (+{(new - old) / old:.0%})")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against results from an earlier --output.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, default 0.25.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="Run only these benchmarks.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only or list(BENCHMARKS), args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": results,
+        "memory": measure_memory(),
+    }
+    for name, size in report["memory"].items():
+        print(f"{name:<32} {size:>12,} bytes", file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+    failures = []
+    startup = results.get("startup_first_paint")
+    if startup and startup["median_ms"] > STARTUP_BUDGET_MS:
+        failures.append(f"startup_first_paint: {startup['median_ms']:.3f}ms over the {STARTUP_BUDGET_MS:.0f}ms budget")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["benchmarks"]
+        failures.extend(compare(results, baseline, args.threshold))
+    for line in failures:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Startup probe, run in a fresh interpreter by the startup benchmarks:
+    python -m benchmarks.startup <db_path>
+
+Prints JSON with the time to import timewizard, the time from import to the first paint of
+MainScreen, and whether the db file was touched along the way (it should not be).
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+start_time = time.perf_counter()
+
+from timewizard import MainScreen, TimeWizardApp
+
+import_ms = (time.perf_counter() - start_time) * 1000
+
+
+async def first_paint(db_path: str) -> float:
+    app = TimeWizardApp(db_path=db_path)
+    async with app.run_test(size=(140, 60)) as pilot:
+        await pilot.pause()
+        assert isinstance(app.screen, MainScreen)
+        return (time.perf_counter() - start_time) * 1000
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1]
+    first_paint_ms = asyncio.run(first_paint(db_path))
+    print(json.dumps({
+        "import_ms": import_ms,
+        "first_paint_ms": first_paint_ms,
+        "db_opened": os.path.exists(db_path),
+    }))
@@ -0,0 +1,122 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Optional
+
+from day_store import Day
+
+MonthKey = tuple[int, int]
+
+DEFAULT_MAX_BYTES = 512 * 1024
+
+
+class CalendarCache:
+    """
+    In-memory cache of calendar rows keyed by (year, month).
+
+    Months are evicted least recently used first once the estimated size of the cached rows
+    passes max_bytes. Rows are shared with callers, so writes must go through update_day to
+    keep the cache and the database in step.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._months: OrderedDict[MonthKey, list[Day]] = OrderedDict()
+        self._month_sizes: dict[MonthKey, int] = {}
+        self._days: dict[str, Day] = {}
+        self._jobs: dict[str, dict[str, Any]] = {}
+
+    def get_month(self, year: int, month: int) -> Optional[list[Day]]:
+        """Returns the cached rows for a month, or None if the month is not cached."""
+        key = (year, month)
+        days = self._months.get(key)
+        if days is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._months.move_to_end(key)
+        return days
+
+    def get_day(self, date_string: str) -> Optional[Day]:
+        """Returns the cached row for a single date without touching hit counters."""
+        return self._days.get(date_string)
+
+    def put_month(self, year: int, month: int, days: list[Day]) -> None:
+        """Stores the rows for a month, evicting older months if over budget."""
+        key = (year, month)
+        self.invalidate_month(year, month)
+        size = sys.getsizeof(days) + sum(self._row_size(day) for day in days)
+        self._months[key] = days
+        self._month_sizes[key] = size
+        self.size_bytes += size
+        for day in days:
+            self._days[day["date_string"]] = day
+        self._evict()
+
+    def update_day(self, date_string: str, column: str, value: Any) -> None:
+        """Applies a write to a cached row, if that day's month is cached."""
+        day = self._days.get(date_string)
+        if day is not None:
+            day[column] = value
+
+    def invalidate_month(self, year: int, month: int) -> None:
+        """Drops a single month from the cache."""
+        key = (year, month)
+        days = self._months.pop(key, None)
+        if days is None:
+            return
+        self.size_bytes -= self._month_sizes.pop(key)
+        for day in days:
+            self._days.pop(day["date_string"], None)
+
+    def invalidate_year(self, year: int) -> None:
+        """Drops every cached month of a year."""
+        for month in range(1, 13):
+            self.invalidate_month(year, month)
+
+    def get_job(self, job_name: str) -> Optional[dict[str, Any]]:
+        return self._jobs.get(job_name)
+
+    def put_job(self, job_name: str, job: dict[str, Any]) -> None:
+        self._jobs[job_name] = job
+
+    def update_job(self, job_name: str, column: str, value: Any) -> None:
+        job = self._jobs.get(job_name)
+        if job is not None:
+            job[column] = value
+
+    def clear_days(self) -> None:
+        """Drops every cached month but keeps cached jobs."""
+        self._months.clear()
+        self._month_sizes.clear()
+        self._days.clear()
+        self.size_bytes = 0
+
+    def clear(self) -> None:
+        """Drops everything, keeping the hit and miss counters."""
+        self.clear_days()
+        self._jobs.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "months": len(self._months),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _evict(self) -> None:
+        """Evicts least recently used months until under budget, always keeping the newest."""
+        while self.size_bytes > self.max_bytes and len(self._months) > 1:
+            year, month = next(iter(self._months))
+            self.invalidate_month(year, month)
+            self.evictions += 1
+
+    @staticmethod
+    def _row_size(row: Day) -> int:
+        return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
@@ -0,0 +1,357 @@
+"""
+Command line batch mode for the calendar db, without starting the TUI or importing Textual.
+
+Run from the repo root:
+    python cli.py mark 2025-03-01 2025-03-31 --weekdays sat,sun
+    python cli.py unmark 2025-03-08
+    python cli.py report month 2025-03 --json
+    python cli.py report period 2025-03-11
+    python cli.py report year 2025
+    python cli.py optimize year 2025 --target 60000 --max-per-week 4 --max-consecutive 3 --apply
+    python cli.py simulate 2025 --extra-shifts 0 1 2 --drop sat,sun --rate-multipliers 1 1.05
+    python cli.py export shifts shifts.ics
+    python cli.py import calendar calendar.csv
+
+Changes are written in one transaction, and a running TUI picks them up on its next poll. Bad
+arguments and failed writes print an error and exit with status 1.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+
+from connection_profile import PROFILES
+from database_manager import DatabaseManager
+from optimizer import Constraints, apply_plan, optimize, plan_changes
+from payroll import PayrollEngine
+from scenarios import RANK_KEYS, load_base, scenario_grid, simulate
+from transfer import FORMATS, export_table, import_table
+from withholding import DEFAULT_WITHHOLDING, PERIODS_PER_YEAR, PayLedger, Withholding, withholding_engine
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Day columns that mark and unmark can set.
+MARK_COLUMNS = ("is_working", "is_night", "is_critical")
+REPORT_SCOPES = ("month", "period", "year")
+
+
+def parse_weekdays(text: str) -> set[int]:
+    """Weekday numbers, Monday as 0, from names and ranges like 'sat,sun' or 'mon-wed,fri'."""
+    weekdays = set()
+    for part in text.lower().split(","):
+        first, _, last = part.strip().partition("-")
+        try:
+            start = WEEKDAYS.index(first[:3])
+            end = WEEKDAYS.index(last[:3]) if last else start
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Unknown weekday in {part!r}, expected one of {WEEKDAYS}") from None
+        weekdays.update(range(start, end + 1) if start <= end else (*range(start, 7), *range(0, end + 1)))
+    return weekdays
+
+
+def parse_date(text: str) -> date:
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a YYYY-MM-DD date") from None
+
+
+def selected_dates(start: date, end: date, weekdays: Optional[set[int]]) -> list[date]:
+    """Every date from start to end inclusive falling on one of weekdays, or on any day if None."""
+    dates = []
+    day = start
+    while day <= end:
+        if weekdays is None or day.weekday() in weekdays:
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def mark_days(db_manager: DatabaseManager, dates: list[date], column: str, value: bool) -> list[str]:
+    """
+    Sets column on every date, adding missing years first, and returns the dates that changed.
+    Days already set are left alone so they don't show up as changes in other instances.
+    """
+    if not dates:
+        return []
+    db_manager.insert_years({day.year for day in dates})
+    wanted = {str(day) for day in dates}
+    changed = [
+        day["date_string"]
+        for day in db_manager.get_days_range(str(dates[0]), str(dates[-1]))
+        if day["date_string"] in wanted and bool(day[column]) != value
+    ]
+    for date_string in changed:
+        db_manager.update_day(date_string, column, value)
+    db_manager.flush()
+    return changed
+
+
+def report_pay_days(db_manager: DatabaseManager, scope: str, when: str) -> dict[date, tuple[date, date]]:
+    """
+    The pay periods of a month (YYYY-MM), the period paid on a payday (YYYY-MM-DD) or a year
+    (YYYY), keyed by payday.
+    """
+    pay_calendar = db_manager.pay_calendar
+    if scope == "month":
+        try:
+            first = datetime.strptime(when, "%Y-%m").date()
+        except ValueError:
+            raise ValueError(f"{when!r} is not a YYYY-MM month") from None
+        return pay_calendar.pay_days_in_month(first.year, first.month)
+    if scope == "period":
+        try:
+            pay_day = date.fromisoformat(when)
+        except ValueError:
+            raise ValueError(f"{when!r} is not a YYYY-MM-DD date") from None
+        pay_days = pay_calendar.pay_days_in_month(pay_day.year, pay_day.month)
+        if pay_day not in pay_days:
+            raise ValueError(f"{when} is not a payday")
+        return {pay_day: pay_days[pay_day]}
+    if not (len(when) == 4 and when.isdigit()):
+        raise ValueError(f"{when!r} is not a YYYY year")
+    return {period.pay_day: (period.start, period.end) for period in pay_calendar.periods_for_year(int(when))}
+
+
+def pay_report(db_manager: DatabaseManager, scope: str, when: str) -> dict[str, Any]:
+    """
+    Pay for each payday in a month, pay period or year, worked out by PayrollEngine and split
+    into withholding as on the work schedule.
+    """
+    pay_days = report_pay_days(db_manager, scope, when)
+    job = db_manager.get_job(db_manager.DEFAULT_JOB_NAME)
+    if job is None:
+        raise ValueError(f"No job named {db_manager.DEFAULT_JOB_NAME!r} in {db_manager.db_path}")
+    payroll = PayrollEngine(job)
+    if pay_days:
+        db_manager.insert_years({start.year for start, _ in pay_days.values()})
+        first_day = min(start for start, _ in pay_days.values())
+        last_day = max(end for _, end in pay_days.values())
+        payroll.add_periods(
+            pay_days,
+            db_manager.get_days_range(str(first_day), str(last_day)),
+            db_manager.get_shift_totals(str(first_day), str(last_day)),
+        )
+    gross = {pay_day: payroll.period_pay(pay_day) for pay_day in pay_days}
+    return {
+        "scope": scope,
+        "when": when,
+        "job": job["job_name"],
+        **withhold_periods(db_manager, pay_days, gross),
+    }
+
+
+def withhold_periods(
+        db_manager: DatabaseManager,
+        pay_days: dict[date, tuple[date, date]],
+        gross: dict[date, float]
+    ) -> dict[str, Any]:
+    """
+    Splits the gross pay of each payday into withholding, given the stored pay of the rest of
+    its year, and totals them.
+    """
+    pay_calendar = db_manager.pay_calendar
+    engine = withholding_engine(DEFAULT_WITHHOLDING, PERIODS_PER_YEAR[pay_calendar.cadence])
+    ledgers = {
+        year: PayLedger.from_summaries(
+            engine,
+            [period.pay_day for period in pay_calendar.periods_for_year(year)],
+            db_manager.get_summaries("period", [year]) or {},
+        )
+        for year in {pay_day.year for pay_day in pay_days}
+    }
+
+    periods = []
+    total = Withholding()
+    for pay_day, (start, end) in sorted(pay_days.items()):
+        ledger = ledgers[pay_day.year]
+        ledger.set_gross(pay_day, gross[pay_day])
+        withholding = ledger.withholding(pay_day)
+        total += withholding
+        periods.append({"pay_day": str(pay_day), "start": str(start), "end": str(end), **withholding_fields(withholding)})
+    return {"periods": periods, **withholding_fields(total)}
+
+
+def withholding_fields(withholding: Withholding) -> dict[str, float]:
+    fields = {**withholding._asdict(), "net": withholding.net}
+    return {name: round(value, 2) for name, value in fields.items()}
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [f"{report['job']} pay for {report['scope']} {report['when']}"]
+    for period in (*report["periods"], {**report, "pay_day": "total", "start": "", "end": ""}):
+        dates = f"{period['start']} to {period['end']}" if period["start"] else ""
+        lines.append(
+            f"  {period['pay_day']:<10}  {dates:<24}  gross ${period['gross']:>10,.2f}  "
+            f"pre-tax ${period['pretax']:>9,.2f}  federal ${period['federal']:>9,.2f}  "
+            f"state ${period['state']:>8,.2f}  fica ${period['social_security'] + period['medicare']:>8,.2f}  "
+            f"net ${period['net']:>10,.2f}"
+        )
+    return "\n".join(lines)
+
+
+def format_scenarios(results: list[dict[str, Any]]) -> str:
+    lines = []
+    for rank, result in enumerate(results, start=1):
+        lines.append(
+            f"  {rank:>3}. {result['name']:<48}  gross ${result['gross']:>11,.2f}  net ${result['net']:>11,.2f}  "
+            f"overtime {result['overtime_hours']:>5g}h  shifts {result['shifts']:>3}"
+        )
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Batch edits and pay reports for the calendar db.")
+    parser.add_argument("--db", default="db/calendar.db", help="Calendar db to use.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default", help="SQLite connection profile.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    # Lets --json also go after the command, without overriding one given before it.
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help="Print results as JSON.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("mark", "Mark days as worked."), ("unmark", "Mark days as not worked.")):
+        command = commands.add_parser(name, help=help_text, parents=[output])
+        command.add_argument("start", type=parse_date)
+        command.add_argument("end", type=parse_date, nargs="?", help="Last day, inclusive. Defaults to start.")
+        command.add_argument("--weekdays", type=parse_weekdays, help="Only these days, e.g. sat,sun or mon-wed.")
+        command.add_argument("--column", choices=MARK_COLUMNS, default="is_working", help="Flag to set.")
+
+    report = commands.add_parser("report", help="Pay per payday for a month, pay period or year.", parents=[output])
+    report.add_argument("scope", choices=REPORT_SCOPES)
+    report.add_argument("when", help="YYYY-MM for a month, the payday as YYYY-MM-DD for a period, YYYY for a year.")
+
+    optimize_command = commands.add_parser(
+        "optimize", help="Choose the days to work in a month, pay period or year.", parents=[output]
+    )
+    optimize_command.add_argument("scope", choices=REPORT_SCOPES)
+    optimize_command.add_argument("when", help="YYYY-MM for a month, the payday as YYYY-MM-DD for a period, YYYY for a year.")
+    optimize_command.add_argument(
+        "--target", type=float, help="Gross pay to reach on the fewest shifts. Without it, the most pay is planned."
+    )
+    optimize_command.add_argument("--max-per-week", type=int, default=7, help="Most shifts in an overtime week.")
+    optimize_command.add_argument("--max-consecutive", type=int, help="Most days worked in a row.")
+    optimize_command.add_argument("--max-shifts", type=int, help="Most shifts in the whole plan.")
+    optimize_command.add_argument("--weekdays-off", type=parse_weekdays, default=set(), help="Weekdays never worked, e.g. sun.")
+    optimize_command.add_argument("--off", type=parse_date, nargs="+", default=[], help="Dates never worked.")
+    optimize_command.add_argument("--apply", action="store_true", help="Write the plan to the calendar.")
+
+    simulate_command = commands.add_parser(
+        "simulate", help="Rank a year's pay under every combination of schedule rules.", parents=[output]
+    )
+    simulate_command.add_argument("year", type=int)
+    simulate_command.add_argument("--extra-shifts", type=int, nargs="+", default=[0], help="Extra shifts a week to try.")
+    simulate_command.add_argument(
+        "--drop", type=parse_weekdays, action="append", default=[], help="Weekdays never worked, e.g. sat,sun. Repeatable."
+    )
+    simulate_command.add_argument(
+        "--add", type=parse_weekdays, action="append", default=[], help="Weekdays always worked. Repeatable."
+    )
+    simulate_command.add_argument("--rate-multipliers", type=float, nargs="+", default=[1.0], help="Rate scales to try.")
+    simulate_command.add_argument("--rank", choices=RANK_KEYS, default="net")
+    simulate_command.add_argument("--top", type=int, default=10, help="How many results to show.")
+    simulate_command.add_argument("--workers", type=int, help="Worker processes, default one per core.")
+
+    for name, help_text in (("export", "Write a table to a file."), ("import", "Read a file into a table.")):
+        command = commands.add_parser(name, help=help_text, parents=[output])
+        command.add_argument("table", choices=("calendar", "jobs", "expenses", "shifts"))
+        command.add_argument("path", help="File to use, or - for stdin or stdout.")
+        command.add_argument("--format", choices=FORMATS, help="Defaults to the path's suffix.")
+        if name == "import":
+            command.add_argument("--job", help="Job for shifts that don't name one.")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in ("export", "import") and args.path == "-" and args.format is None:
+        parser.error("--format is needed when reading stdin or writing stdout")
+
+    db_manager = DatabaseManager(args.db, write_behind=True, profile=PROFILES[args.profile])
+    try:
+        if args.command in ("mark", "unmark"):
+            end = args.end or args.start
+            if end < args.start:
+                parser.error("end is before start")
+            changed = mark_days(
+                db_manager, selected_dates(args.start, end, args.weekdays), args.column, args.command == "mark"
+            )
+            result = {"command": args.command, "column": args.column, "changed": changed}
+            text = f"{args.command}ed {len(changed)} day(s)"
+        elif args.command == "report":
+            result = pay_report(db_manager, args.scope, args.when)
+            text = format_report(result)
+        elif args.command == "optimize":
+            pay_days = report_pay_days(db_manager, args.scope, args.when)
+            constraints = Constraints(
+                max_shifts_per_week=args.max_per_week,
+                max_consecutive=args.max_consecutive,
+                max_shifts=args.max_shifts,
+                days_off=frozenset(args.off),
+                weekdays_off=frozenset(args.weekdays_off),
+            )
+            plan = optimize(db_manager, pay_days, constraints, args.target)
+            changed = apply_plan(db_manager, plan) if args.apply else list(plan_changes(db_manager, plan))
+            result = {
+                "scope": args.scope,
+                "when": args.when,
+                "job": db_manager.DEFAULT_JOB_NAME,
+                "target": args.target,
+                "applied": args.apply,
+                "shifts": plan.shifts,
+                "hours": plan.hours,
+                "overtime_hours": plan.overtime_hours,
+                "worked": [str(day) for day in plan.worked],
+                "changed": changed,
+                **withhold_periods(db_manager, pay_days, plan.gross_by_pay_day),
+            }
+            text = format_report(result) + (
+                f"\n{plan.shifts} shift(s), {plan.hours}h with {plan.overtime_hours}h overtime, "
+                f"{len(changed)} day(s) {'changed' if args.apply else 'to change, pass --apply to write them'}"
+            )
+        elif args.command == "simulate":
+            # The stored schedule is always one of the candidates, so results read against it.
+            scenarios = scenario_grid(
+                extra_shifts_per_week=args.extra_shifts,
+                drop_weekdays=[frozenset(), *map(frozenset, args.drop)],
+                add_weekdays=[frozenset(), *map(frozenset, args.add)],
+                rate_multipliers=args.rate_multipliers,
+            )
+            results = simulate(load_base(db_manager, args.year), scenarios, args.rank, args.workers)
+            result = {
+                "year": args.year,
+                "scenarios": len(scenarios),
+                "results": [
+                    {**asdict(scenario_result), "gross": round(scenario_result.gross, 2), "net": round(scenario_result.net, 2)}
+                    for scenario_result in results[:args.top]
+                ],
+            }
+            text = f"top {len(result['results'])} of {len(scenarios)} scenarios for {args.year} by {args.rank}\n"
+            text += format_scenarios(result["results"])
+        elif args.command == "export":
+            count = export_table(db_manager, args.table, args.path, args.format)
+            result = {"command": "export", "table": args.table, "rows": count}
+            text = f"exported {count} {args.table} row(s)"
+        else:
+            count = import_table(db_manager, args.table, args.path, args.format, args.job)
+            result = {"command": "import", "table": args.table, "rows": count}
+            text = f"imported {count} {args.table} row(s)"
+    except (ValueError, sqlite3.Error) as error:
+        # Nothing was written, so don't let close try the failed writes again.
+        db_manager.discard_pending_writes()
+        print(f"{parser.prog}: error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        db_manager.close()
+
+    # Exports to stdout are the output themselves.
+    if args.command != "export" or args.path != "-":
+        print(json.dumps(result) if args.json else text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import sqlite3
+from dataclasses import dataclass
+
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+SYNCHRONOUS_MODES = ("off", "normal", "full", "extra")
+TEMP_STORES = ("default", "file", "memory")
+
+
+@dataclass(frozen=True, slots=True)
+class ConnectionProfile:
+    """
+    SQLite settings applied to every connection as it opens. cache_size follows the PRAGMA:
+    positive is pages, negative is KiB. cached_statements sizes the sqlite3 module's prepared
+    statement cache. busy_timeout_ms is how long a statement waits on another process's lock
+    before failing as busy.
+    """
+    journal_mode: str = "wal"
+    synchronous: str = "normal"
+    mmap_size: int = 64 * 1024 * 1024
+    cache_size: int = -16 * 1024
+    temp_store: str = "memory"
+    cached_statements: int = 256
+    busy_timeout_ms: int = 2000
+
+    def __post_init__(self) -> None:
+        # These go into PRAGMA statements as text, so only accept the documented values.
+        for value, allowed in (
+            (self.journal_mode, JOURNAL_MODES),
+            (self.synchronous, SYNCHRONOUS_MODES),
+            (self.temp_store, TEMP_STORES),
+        ):
+            if value not in allowed:
+                raise ValueError(f"Unknown SQLite setting {value!r}, expected one of {allowed}")
+
+    def apply(self, connection: sqlite3.Connection) -> None:
+        # First, so switching the journal mode also waits out other instances.
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        connection.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        connection.execute(f"PRAGMA synchronous = {self.synchronous}")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        connection.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        connection.execute(f"PRAGMA temp_store = {self.temp_store}")
+
+
+PROFILES = {
+    # WAL lets reads run alongside the write-behind flushes, and NORMAL only syncs at checkpoints.
+    "default": ConnectionProfile(),
+    # Same, but every commit is synced. For a db that must survive power loss mid-session.
+    "durable": ConnectionProfile(synchronous="full"),
+    # SQLite's own defaults, for a db on a network share where WAL and mmap aren't safe.
+    "compatible": ConnectionProfile(
+        journal_mode="delete",
+        synchronous="full",
+        mmap_size=0,
+        cache_size=-2000,
+        temp_store="default",
+        cached_statements=128,
+    ),
+}
@@ -1,39 +1,325 @@
+import functools
+import itertools
 import sqlite3
 import datetime
+import threading
 import time
 from datetime import timedelta
-from rich.console import Console
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Optional
+
+from calendar_cache import CalendarCache, MonthKey
+from connection_profile import PROFILES, ConnectionProfile
+from day_store import Day, YearStore
+from earnings_index import EarningsIndex
+from instrumentation import stats, traced
+from migrations import DEFAULT_SHIFT_START, migrate
+from pay_calendar import DEFAULT_PAY_CALENDAR, PayCalendar
+from payroll import OVERTIME_THRESHOLD_HOURS, SHIFT_HOURS
+from recurring_expenses import ExpenseSchedule
+
+if TYPE_CHECKING:
+    from async_database import AsyncDatabaseManager
+    from rich.console import Console
+
+
+class LazyConsole:
+    """
+    Stands in for a rich Console, importing rich the first time it is used. Errors are rare, so
+    headless callers like cli.py start without paying for the import.
+    """
+
+    _console: Optional["Console"] = None
+
+    def __getattr__(self, name: str):
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return getattr(self._console, name)
+
+
+console = LazyConsole()
+
+
+# A day's worth is derived from the job's current rates whenever it is read, so a rate change is
+# a single write to jobs. Reads LEFT JOIN jobs as j, one row per job_name.
+WORTH_SQL = f"""
+    COALESCE(
+        j.hourly_rate * {SHIFT_HOURS}
+        + CASE WHEN c.is_weekend THEN j.weekend_rate * {SHIFT_HOURS} ELSE 0 END
+        + CASE WHEN c.is_night THEN j.night_rate * {SHIFT_HOURS} ELSE 0 END
+        + CASE WHEN c.is_critical THEN j.critical_rate * {SHIFT_HOURS} ELSE 0 END,
+        0
+    )
+"""
+DIFFERENTIAL_COLUMNS = {"is_weekend": "weekend_rate", "is_night": "night_rate", "is_critical": "critical_rate"}
+
+
+def day_worth(day: Day, job: Optional[dict[str, str | int | float]]) -> float:
+    """Python twin of WORTH_SQL, for patching cached rows after a differential changes."""
+    if not job:
+        return 0.0
+    worth = job["hourly_rate"] * SHIFT_HOURS
+    for column, rate in DIFFERENTIAL_COLUMNS.items():
+        if day.get(column):
+            worth += job[rate] * SHIFT_HOURS
+    return worth
+
+
+# Hours worked per (bucket, Sunday-start week) for one job, where buckets is a CTE of
+# (bucket, start_date, end_date) windows supplied by the caller. Shifts count toward the
+# window and week they start in. Overtime follows payroll.weekly_overtime.
+WEEKLY_HOURS_CTE = f"""
+    shift_hours AS (
+        SELECT
+            b.bucket,
+            date(s.start_time, '-' || strftime('%w', s.start_time) || ' days') AS week_start,
+            ROUND((julianday(s.end_time) - julianday(s.start_time)) * 24, 4) AS hours,
+            strftime('%w', s.start_time) IN ('0', '6') AS is_weekend,
+            s.is_night,
+            s.is_critical
+        FROM buckets AS b
+        JOIN shifts AS s
+            ON s.start_time >= b.start_date AND s.start_time < date(b.end_date, '+1 day')
+        WHERE s.job_id = (SELECT id FROM jobs WHERE job_name = :job_name)
+    ),
+    weeks AS (
+        SELECT
+            bucket,
+            week_start,
+            SUM(hours) AS hours,
+            MAX(SUM(hours) - {OVERTIME_THRESHOLD_HOURS}, 0) AS overtime_hours,
+            SUM(CASE WHEN is_night THEN hours ELSE 0 END) AS night_hours,
+            SUM(CASE WHEN is_weekend THEN hours ELSE 0 END) AS weekend_hours,
+            SUM(CASE WHEN is_critical THEN hours ELSE 0 END) AS critical_hours
+        FROM shift_hours
+        GROUP BY bucket, week_start
+    )
+"""
+# Gross pay for a row of summed hours, with the job's rates joined as j.
+GROSS_SQL = """
+    j.hourly_rate * hours
+    + (j.overtime_rate - j.hourly_rate) * overtime_hours
+    + j.night_rate * night_hours
+    + j.weekend_rate * weekend_hours
+    + j.critical_rate * critical_hours
+"""
+
+
+# Levels of the pay_summaries rollup, each summed from the one before it. Weeks are the 7 day
+# chunks of a pay period that payroll counts overtime over, and months and years group pay periods
+# by the month and year of their payday, matching the totals shown on the work schedule.
+SUMMARY_LEVELS = ("week", "period", "month", "year")
+SUMMARY_COLUMNS = ("hours", "overtime_hours", "night_hours", "weekend_hours", "critical_hours")
+
+
+# Hours and straight-time worth per worked day for one job, summed from its shifts. Callers
+# append any extra filter on shift_date.
+DAY_EARNINGS_SQL = """
+    SELECT
+        date(s.start_time) AS shift_date,
+        TOTAL(hours),
+        TOTAL(hours * (
+            j.hourly_rate
+            + CASE WHEN strftime('%w', s.start_time) IN ('0', '6') THEN j.weekend_rate ELSE 0 END
+            + CASE WHEN s.is_night THEN j.night_rate ELSE 0 END
+            + CASE WHEN s.is_critical THEN j.critical_rate ELSE 0 END
+        ))
+    FROM (
+        SELECT *, ROUND((julianday(end_time) - julianday(start_time)) * 24, 4) AS hours FROM shifts
+    ) AS s
+    JOIN jobs AS j ON j.id = s.job_id
+    WHERE j.job_name = ?
+"""
+
+
+class HoursSummary(NamedTuple):
+    """Hours worked in a window, split the way they are paid, plus the resulting gross."""
+    hours: float = 0.0
+    regular_hours: float = 0.0
+    overtime_hours: float = 0.0
+    night_hours: float = 0.0
+    weekend_hours: float = 0.0
+    critical_hours: float = 0.0
+    gross: float = 0.0
+
+
+class ProvisionReport(NamedTuple):
+    """What insert_years wrote and how long it took."""
+    years_inserted: list[int]
+    years_skipped: list[int]
+    days_inserted: int
+    elapsed_ms: float
+
+
+class CalendarChanges(NamedTuple):
+    """Months changed by another connection since the last poll, or everything if the log can't say."""
+    months: frozenset[MonthKey] = frozenset()
+    everything: bool = False
+
+
+# Columns each table is exported and imported with, in file order. Calendar rows carry only the
+# date and the flags a user sets; shifts name their job instead of its id.
+TRANSFER_COLUMNS = {
+    "calendar": ("date_string", "is_working", "is_overtime", "is_night", "is_critical"),
+    "jobs": ("job_name", "hourly_rate", "overtime_rate", "weekend_rate", "night_rate", "critical_rate"),
+    "expenses": ("id", "name", "amount", "start_date", "end_date", "daily", "weekly", "biweekly", "monthly", "day"),
+    "shifts": ("job_name", "start_time", "end_time", "is_night", "is_critical"),
+}
+EXPORT_SQL = {
+    "calendar": f"SELECT {', '.join(TRANSFER_COLUMNS['calendar'])} FROM calendar ORDER BY date_string",
+    "jobs": f"SELECT {', '.join(TRANSFER_COLUMNS['jobs'])} FROM jobs ORDER BY id",
+    "expenses": f"SELECT {', '.join(TRANSFER_COLUMNS['expenses'])} FROM expenses ORDER BY id",
+    "shifts": """
+        SELECT j.job_name, s.start_time, s.end_time, s.is_night, s.is_critical
+        FROM shifts AS s JOIN jobs AS j ON j.id = s.job_id
+        ORDER BY j.id, s.start_time
+    """,
+}
+# Rows fetched or written per batch by exports and imports, so memory stays flat with file size.
+TRANSFER_CHUNK_ROWS = 2000
+
+
+# A write that still finds the db locked after the connection's busy_timeout is retried this many
+# times, waiting BUSY_BACKOFF_SECONDS and doubling between attempts.
+BUSY_RETRIES = 4
+BUSY_BACKOFF_SECONDS = 0.05
+# Rows of calendar_changes kept for other instances to catch up on.
+CHANGE_LOG_ROWS = 10_000
+
+
+def is_busy(error: Exception) -> bool:
+    """True if error is SQLite reporting the db as busy or locked by another connection."""
+    return (
+        isinstance(error, sqlite3.OperationalError)
+        and getattr(error, "sqlite_errorcode", 0) & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    )
+
+
+def retry_on_busy(method=None, *, reraise: bool = False):
+    """
+    Reruns a DatabaseManager write that hit a lock held by another process, rolling back and
+    backing off between attempts. Methods let busy errors escape their own handlers so this sees
+    them. After the last attempt the error is printed like any other db failure, or raised with
+    reraise for writes whose callers must know they failed.
+    """
+    if method is None:
+        return functools.partial(retry_on_busy, reraise=reraise)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as error:
+                if not is_busy(error):
+                    raise
+                if self._connection is not None and self._connection.in_transaction:
+                    self._connection.rollback()
+                if attempt == BUSY_RETRIES:
+                    if reraise:
+                        raise
+                    console.print_exception()
+                    return None
+                time.sleep(BUSY_BACKOFF_SECONDS * 2 ** attempt)
+    return wrapper
+
+
+def synchronized(method):
+    """Serializes calls to a DatabaseManager method so the connection can be shared across threads."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
-console = Console()
 
 class DatabaseManager:
 
     DEFAULT_JOB_NAME = "unc_nursing"
 
-    def __init__(self, db_path: str = "db/calendar.db") -> None:
+    def __init__(
+            self,
+            db_path: str = "db/calendar.db",
+            cache: Optional[CalendarCache] = None,
+            write_behind: bool = False,
+            pay_calendar: Optional[PayCalendar] = None,
+            profile: Optional[ConnectionProfile] = None
+        ) -> None:
+        """
+        With write_behind, update_day only queues the change and flush writes every queued change
+        in one transaction. Queued changes are visible to reads straight away. Leave it off for
+        strict durability, where every update_day commits before returning. pay_calendar decides
+        which pay week, period, month and year the maintained pay summaries put each day in.
+        profile holds the SQLite settings applied when the connection opens.
+        """
         self.db_path = db_path
+        self.cache = cache if cache is not None else CalendarCache()
+        self.write_behind = write_behind
+        self.pay_calendar = pay_calendar if pay_calendar is not None else DEFAULT_PAY_CALENDAR
+        self.profile = profile if profile is not None else PROFILES["default"]
+        self._pending_days: dict[str, dict[str, str | int | bool]] = {}
         self._connection: Optional[sqlite3.Connection] = None
         self._cursor: Optional[sqlite3.Cursor] = None
+        self._lock = threading.RLock()
+        self._known_years: set[int] = set()
+        self._expense_schedule: Optional[ExpenseSchedule] = None
+        self._earnings_indexes: dict[str, EarningsIndex] = {}
+        self._data_version = 0
+        self._change_log_id = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The db connection, opened on first use."""
+        self._connect()
+        return self._connection
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """The shared cursor, opened with the connection on first use."""
         self._connect()
+        return self._cursor
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connection is not None
 
     def _connect(self) -> None:
-        """Connect to on-disk SQLite db."""
+        """Connect to on-disk SQLite db, apply the connection profile and migrate the schema."""
         if self._connection is None:
-            self._connection = sqlite3.connect(self.db_path)
+            self._connection = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=self.profile.cached_statements,
+            )
             self._connection.row_factory = sqlite3.Row
+            self._connection.set_trace_callback(stats.trace_statement)
             self._cursor = self._connection.cursor()
+            self.profile.apply(self._connection)
+            migrate(self)
+            self._data_version = self._cursor.execute("PRAGMA data_version").fetchone()[0]
+            self._change_log_id = self._cursor.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM calendar_changes"
+            ).fetchone()[0]
 
+    @synchronized
     def close(self) -> None:
-        """Close db connection."""
+        """Flush pending writes and close db connection."""
+        try:
+            self.flush()
+        except Exception:
+            # Closing goes ahead regardless, so the queued writes are lost. Say so.
+            console.print_exception()
         if self._connection:
             self._connection.close()
             self._connection = None
             self._cursor = None
 
+    @synchronized
+    @traced
     def create_expenses_table(self) -> None:
         """
-        Create expenses table.
+        Tables are created by migrations when the connection opens, so this only opens it.
         Columns:
             id: int
             daily: bool
@@ -43,91 +329,546 @@ class DatabaseManager:
             day: int
             amount: float
             name: str
+            start_date: str
+            end_date: str
         """
-        table_name = "expenses"
-        self._cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-            id INTEGER PRIMARY KEY ASC,
-            daily BOOL NOT NULL,
-            weekly BOOL NOT NULL,
-            biweekly BOOL NOT NULL,
-            monthly BOOL NOT NULL,
-            day INTEGER,
-            amount REAL NOT NULL,
-            name TEXT NOT NULL,
-            )         
-        """
-        )
-        self._connection.commit()
+        self._connect()
+
+    @property
+    def expense_schedule(self) -> ExpenseSchedule:
+        """Recurring expense engine over the expenses table, loaded on first use and kept in step with edits."""
+        with self._lock:
+            if self._expense_schedule is None:
+                self._expense_schedule = ExpenseSchedule(self.get_expenses())
+            return self._expense_schedule
 
+    @synchronized
+    @traced
+    def get_expenses(self) -> list[dict[str, str | int | float]]:
+        try:
+            self.cursor.execute(f"""
+                SELECT * FROM expenses ORDER BY id
+            """)
+            return [dict(row) for row in self.cursor.fetchall()]
+        except Exception:
+            console.print_exception()
+            return []
+
+    @synchronized
+    @traced
+    @retry_on_busy
+    def insert_expense(
+            self,
+            name: str,
+            amount: float,
+            start_date: str,
+            daily: bool = False,
+            weekly: bool = False,
+            biweekly: bool = False,
+            monthly: bool = False,
+            day: Optional[int] = None,
+            end_date: Optional[str] = None
+        ) -> Optional[int]:
+        """Adds an expense, one-off if no cadence flag is set, and returns its id."""
+        try:
+            self.cursor.execute(f"""
+                INSERT INTO expenses (
+                    daily, weekly, biweekly, monthly, day, amount, name, start_date, end_date
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (daily, weekly, biweekly, monthly, day, amount, name, start_date, end_date))
+            self.connection.commit()
+            expense_id = self.cursor.lastrowid
+            if self._expense_schedule is not None:
+                self._expense_schedule.put_expense(self._get_expense(expense_id))
+            return expense_id
+        except Exception as error:
+            if is_busy(error):
+                raise
+            console.print_exception()
+
+    @synchronized
+    @traced
+    @retry_on_busy
+    def update_expense(self, expense_id: int, column: str, value: str | int | float | bool | None) -> None:
+        try:
+            self.cursor.execute(f"""
+                UPDATE expenses SET {column} = ? WHERE id = ?
+            """, (value, expense_id))
+            self.connection.commit()
+            if self._expense_schedule is not None:
+                self._expense_schedule.put_expense(self._get_expense(expense_id))
+        except Exception as error:
+            if is_busy(error):
+                raise
+            console.print_exception()
+
+    @synchronized
+    @traced
+    @retry_on_busy
+    def delete_expense(self, expense_id: int) -> None:
+        try:
+            self.cursor.execute(f"""
+                DELETE FROM expenses WHERE id = ?
+            """, (expense_id,))
+            self.connection.commit()
+            if self._expense_schedule is not None:
+                self._expense_schedule.remove_expense(expense_id)
+        except Exception as error:
+            if is_busy(error):
+                raise
+            console.print_exception()
+
+    def _get_expense(self, expense_id: int) -> dict[str, str | int | float]:
+        return dict(self.cursor.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,)).fetchone())
+
+    @synchronized
+    @traced
     def create_jobs_table(self) -> None:
         """
-        Create jobs table.
+        Tables are created by migrations when the connection opens, so this only opens it.
         """
-        table_name = "jobs"
-        self._cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-            id INTEGER PRIMARY KEY ASC,
-            job_name TEXT NOT NULL UNIQUE,
-            hourly_rate REAL NOT NULL,
-            overtime_rate REAL NOT NULL,
-            weekend_rate REAL NOT NULL,
-            night_rate REAL NOT NULL,
-            critical_rate REAL NOT NULL
-            )
-        """)
-        self._connection.commit()
+        self._connect()
 
+    @synchronized
+    @traced
     def create_year_table(self) -> None:
         """
-        Create calendar table.
+        Tables are created by migrations when the connection opens, so this only opens it.
         """
-        table_name = "calendar"
+        self._connect()
+
+    def _sync_shifts(self, column: str, updates: list[tuple[str, str | int | bool]]) -> None:
+        """
+        Mirrors (date_string, value) day updates into shifts and the pay summaries. Working adds
+        the default shift for the day and not working removes every shift starting that day;
+        night and critical flags are copied onto the day's shifts. Runs inside the caller's
+        transaction.
+        """
+        if column not in ("is_working", "is_night", "is_critical"):
+            return
+        job = self.cursor.execute(
+            "SELECT id FROM jobs WHERE job_name = ?", (self.DEFAULT_JOB_NAME,)
+        ).fetchone()
+        if job is None:
+            return
+        job_id = job["id"]
+        if column == "is_working":
+            added = [(job_id, date_string) for date_string, working in updates if working]
+            removed = [(job_id, date_string, date_string) for date_string, working in updates if not working]
+            if added:
+                self.cursor.executemany(f"""
+                    INSERT INTO shifts (job_id, start_time, end_time, is_night, is_critical)
+                    SELECT ?, date_string || ' {DEFAULT_SHIFT_START}',
+                        datetime(date_string || ' {DEFAULT_SHIFT_START}', '+{SHIFT_HOURS} hours'),
+                        is_night, is_critical
+                    FROM calendar
+                    WHERE date_string = ?
+                    ON CONFLICT DO NOTHING
+                """, added)
+            if removed:
+                self.cursor.executemany(f"""
+                    DELETE FROM shifts
+                    WHERE job_id = ? AND start_time >= ? AND start_time < date(?, '+1 day')
+                """, removed)
+        else:
+            self.cursor.executemany(f"""
+                UPDATE shifts SET {column} = ?
+                WHERE job_id = ? AND start_time >= ? AND start_time < date(?, '+1 day')
+            """, [(value, job_id, date_string, date_string) for date_string, value in updates])
+        self._refresh_summaries(job_id, [date_string for date_string, _ in updates])
+        self._refresh_earnings_index(self.DEFAULT_JOB_NAME, [date_string for date_string, _ in updates])
+
+    def _refresh_earnings_index(self, job_name: str, date_strings: list[str]) -> None:
+        """Re-reads the given days from shifts into the job's earnings index, if it is loaded."""
+        index = self._earnings_indexes.get(job_name)
+        if index is None:
+            return
+        placeholders = ", ".join("?" for _ in date_strings)
         self._cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                date_string TEXT PRIMARY KEY NOT NULL,
-                year INTEGER NOT NULL,
-                month INTEGER NOT NULL,
-                day INTEGER NOT NULL,
-                is_weekend BOOL NOT NULL,
-                is_working BOOL NOT NULL,
-                is_overtime BOOL NOT NULL,
-                worth FLOAT NOT NULL
+            {DAY_EARNINGS_SQL} AND date(s.start_time) IN ({placeholders})
+            GROUP BY shift_date
+        """, (job_name, *date_strings))
+        totals = {shift_date: (hours, worth) for shift_date, hours, worth in self._cursor.fetchall()}
+        for date_string in date_strings:
+            hours, worth = totals.get(date_string, (0.0, 0.0))
+            if not index.set_day(datetime.date.fromisoformat(date_string), hours, worth):
+                # Outside the indexed span, so rebuild over the new span on next use.
+                del self._earnings_indexes[job_name]
+                return
+
+    @synchronized
+    @traced
+    def get_earnings_index(self, job_name: Optional[str] = None) -> Optional[EarningsIndex]:
+        """
+        Returns a job's EarningsIndex over every calendar day, built with one query on first use
+        and kept current as days are toggled.
+        """
+        job_name = job_name or self.DEFAULT_JOB_NAME
+        index = self._earnings_indexes.get(job_name)
+        if index is not None:
+            return index
+        try:
+            first, last = self.cursor.execute(
+                "SELECT MIN(date_string), MAX(date_string) FROM calendar"
+            ).fetchone()
+            if first is None:
+                return None
+            origin = datetime.date.fromisoformat(first)
+            days = (datetime.date.fromisoformat(last) - origin).days + 1
+            self.cursor.execute(f"{DAY_EARNINGS_SQL} GROUP BY shift_date", (job_name,))
+            index = EarningsIndex.from_days(origin, days, self.cursor.fetchall())
+            self._earnings_indexes[job_name] = index
+            return index
+        except Exception:
+            console.print_exception()
+
+    @synchronized
+    @traced
+    def get_shift_totals(self, start: str, end: str, job_name: Optional[str] = None) -> dict[str, tuple[float, float]]:
+        """
+        Hours and straight-time worth of a job's shifts per day they start on, from start to end
+        inclusive, for pricing days the way the pay summaries do. Queued toggles aren't in shifts
+        until flushed.
+        """
+        try:
+            self.cursor.execute(f"""
+                {DAY_EARNINGS_SQL} AND s.start_time >= ? AND s.start_time < date(?, '+1 day')
+                GROUP BY shift_date
+            """, (job_name or self.DEFAULT_JOB_NAME, start, end))
+            return {shift_date: (hours, worth) for shift_date, hours, worth in self.cursor.fetchall()}
+        except Exception:
+            console.print_exception()
+            return {}
+
+    def _rebuild_summaries(self) -> None:
+        self._cursor.execute("DELETE FROM pay_summaries")
+        self._cursor.execute("SELECT DISTINCT job_id, date(start_time) FROM shifts ORDER BY job_id")
+        for job_id, shift_dates in itertools.groupby(self._cursor.fetchall(), key=lambda row: row[0]):
+            self._refresh_summaries(job_id, [shift_date for _, shift_date in shift_dates])
+
+    def _refresh_summaries(self, job_id: int, date_strings: Iterable[str]) -> None:
+        """
+        Recomputes the pay week holding each date from its shifts, then re-sums only the pay
+        periods, months and years above those weeks. Runs inside the caller's transaction.
+        """
+        weeks = set()
+        for date_string in date_strings:
+            day = datetime.date.fromisoformat(date_string)
+            period = self.pay_calendar.period_for(day)
+            if period is None:
+                continue
+            week_start = period.start + timedelta(days=(day - period.start).days // 7 * 7)
+            week_end = min(week_start + timedelta(days=6), period.end)
+            weeks.add((str(week_start), str(week_end), period.pay_day))
+        if not weeks:
+            return
+
+        columns = ", ".join(SUMMARY_COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in SUMMARY_COLUMNS)
+        self._cursor.executemany(f"""
+            INSERT INTO pay_summaries (job_id, level, period_key, parent_key, year, {columns})
+            SELECT ?, 'week', ?, ?, ?,
+                TOTAL(hours),
+                MAX(TOTAL(hours) - {OVERTIME_THRESHOLD_HOURS}, 0),
+                TOTAL(CASE WHEN is_night THEN hours ELSE 0 END),
+                TOTAL(CASE WHEN is_weekend THEN hours ELSE 0 END),
+                TOTAL(CASE WHEN is_critical THEN hours ELSE 0 END)
+            FROM (
+                SELECT
+                    ROUND((julianday(end_time) - julianday(start_time)) * 24, 4) AS hours,
+                    strftime('%w', start_time) IN ('0', '6') AS is_weekend,
+                    is_night,
+                    is_critical
+                FROM shifts
+                WHERE job_id = ? AND start_time >= ? AND start_time < date(?, '+1 day')
             )
-        """)
-        self._connection.commit()
-    
-    def get_days(self, dates: list[str]) -> Optional[list[dict[str, str | int | float | bool]]]:
+            -- Tells the parser ON CONFLICT below is the upsert clause, not a join constraint.
+            WHERE true
+            ON CONFLICT (job_id, level, period_key) DO UPDATE SET {updates}
+        """, [
+            (job_id, week_start, str(pay_day), pay_day.year, job_id, week_start, week_end)
+            for week_start, week_end, pay_day in weeks
+        ])
+
+        # (period_key, parent_key, year) of every affected row above the weeks, per level.
+        pay_days = {pay_day for _, _, pay_day in weeks}
+        parents = {
+            "period": {(str(pay_day), f"{pay_day:%Y-%m}", pay_day.year) for pay_day in pay_days},
+            "month": {(f"{pay_day:%Y-%m}", f"{pay_day:%Y}", pay_day.year) for pay_day in pay_days},
+            "year": {(f"{pay_day:%Y}", None, pay_day.year) for pay_day in pay_days},
+        }
+        totals = ", ".join(f"TOTAL({column})" for column in SUMMARY_COLUMNS)
+        for child_level, level in itertools.pairwise(SUMMARY_LEVELS):
+            self._cursor.executemany(f"""
+                INSERT INTO pay_summaries (job_id, level, period_key, parent_key, year, {columns})
+                SELECT ?, '{level}', ?, ?, ?, {totals}
+                FROM pay_summaries
+                WHERE job_id = ? AND level = '{child_level}' AND parent_key = ?
+                ON CONFLICT (job_id, level, period_key) DO UPDATE SET {updates}
+            """, [
+                (job_id, period_key, parent_key, year, job_id, period_key)
+                for period_key, parent_key, year in parents[level]
+            ])
+
+    @synchronized
+    @traced
+    @retry_on_busy
+    def rebuild_summaries(self) -> None:
+        """Rebuilds every pay summary from shifts, e.g. after switching pay calendars."""
+        try:
+            with self.connection:
+                self._rebuild_summaries()
+        except Exception as error:
+            if is_busy(error):
+                raise
+            console.print_exception()
+
+    @synchronized
+    @traced
+    def get_summaries(
+            self,
+            level: str,
+            years: Iterable[int],
+            job_name: Optional[str] = None
+        ) -> dict[str, HoursSummary]:
         """
-        Given a list of dates, returns list of dicts where dicts are days.
-        Columns:
-            date_string: str
-            year: int
-            month: int
-            day: int
-            is_weekend: bool
-            is_working: bool
-            is_overtime: bool
-            worth: float
+        Returns the maintained HoursSummary of every week, period, month or year whose payday
+        falls in the given years, keyed by the week's first day, the payday, 'YYYY-MM' or 'YYYY'.
+        """
+        if level not in SUMMARY_LEVELS:
+            raise ValueError(f"Unknown summary level {level!r}, expected one of {SUMMARY_LEVELS}")
+        years = list(years)
+        placeholders = ", ".join("?" for _ in years)
+        try:
+            self.cursor.execute(f"""
+                SELECT
+                    s.period_key, hours, hours - overtime_hours, overtime_hours,
+                    night_hours, weekend_hours, critical_hours, {GROSS_SQL}
+                FROM pay_summaries AS s
+                JOIN jobs AS j ON j.id = s.job_id
+                WHERE j.job_name = ? AND s.level = ? AND s.year IN ({placeholders})
+                ORDER BY s.period_key
+            """, (job_name or self.DEFAULT_JOB_NAME, level, *years))
+            return {period_key: HoursSummary(*values) for period_key, *values in self.cursor.fetchall()}
+        except Exception:
+            console.print_exception()
+            return {}
+
+    @synchronized
+    @traced
+    def aggregate_hours(self, start: str, end: str, job_name: Optional[str] = None) -> HoursSummary:
+        """
+        Returns total, regular, overtime, night, weekend and critical hours plus gross pay for
+        shifts starting between start and end (inclusive dates), in one query.
+        """
+        return self.period_hours({"total": (start, end)}, job_name)["total"]
+
+    @synchronized
+    @traced
+    def period_hours(
+            self,
+            periods: dict[str, tuple[str, str]],
+            job_name: Optional[str] = None
+        ) -> dict[str, HoursSummary]:
+        """
+        Given {key: (start, end)} windows such as pay periods, returns an HoursSummary for each
+        in one query. Overtime is counted per Sunday-start week within each window.
+        """
+        summaries = {key: HoursSummary() for key in periods}
+        if not periods:
+            return summaries
+        values = ", ".join("(?, ?, ?)" for _ in periods)
+        params = [value for key, (start, end) in periods.items() for value in (key, start, end)]
+        try:
+            self.cursor.execute(f"""
+                WITH buckets (bucket, start_date, end_date) AS (VALUES {values}),
+                {WEEKLY_HOURS_CTE.replace(":job_name", "?")},
+                totals AS (
+                    SELECT
+                        bucket,
+                        SUM(hours) AS hours,
+                        SUM(overtime_hours) AS overtime_hours,
+                        SUM(night_hours) AS night_hours,
+                        SUM(weekend_hours) AS weekend_hours,
+                        SUM(critical_hours) AS critical_hours
+                    FROM weeks
+                    GROUP BY bucket
+                )
+                SELECT
+                    bucket, hours, hours - overtime_hours, overtime_hours,
+                    night_hours, weekend_hours, critical_hours, {GROSS_SQL}
+                FROM totals JOIN jobs AS j ON j.job_name = ?
+            """, [*params, job_name or self.DEFAULT_JOB_NAME, job_name or self.DEFAULT_JOB_NAME])
+            for bucket, *values in self.cursor.fetchall():
+                summaries[bucket] = HoursSummary(*values)
+        except Exception:
+            console.print_exception()
+        return summaries
+
+    @synchronized
+    @traced
+    def weekly_hours(self, start: str, end: str, job_name: Optional[str] = None) -> dict[str, HoursSummary]:
+        """
+        Returns an HoursSummary for each Sunday-start week with shifts between start and end,
+        keyed by the week's Sunday, in one query.
         """
         try:
-            days_data = []
-            for date in dates:   
-                self._cursor.execute(f"""
-                    SELECT * FROM calendar WHERE date_string = ?
-                """, (date,))
-                row = self._cursor.fetchone()
-                if row:
-                    column_names = [description[0] for description in self._cursor.description]
-                    day_dict = dict(zip(column_names, row))
-                    days_data.append(day_dict)
-            return days_data
+            self.cursor.execute(f"""
+                WITH buckets (bucket, start_date, end_date) AS (VALUES ('range', ?, ?)),
+                {WEEKLY_HOURS_CTE.replace(":job_name", "?")}
+                SELECT
+                    week_start, hours, hours - overtime_hours, overtime_hours,
+                    night_hours, weekend_hours, critical_hours, {GROSS_SQL}
+                FROM weeks JOIN jobs AS j ON j.job_name = ?
+                ORDER BY week_start
+            """, (start, end, job_name or self.DEFAULT_JOB_NAME, job_name or self.DEFAULT_JOB_NAME))
+            return {week_start: HoursSummary(*values) for week_start, *values in self.cursor.fetchall()}
         except Exception:
             console.print_exception()
+            return {}
 
-    def get_job(self, job_name: str) -> Optional[sqlite3.Row]:
+    @synchronized
+    @traced
+    def get_days(self, dates: list[str]) -> Optional[list[Day]]:
+        """
+        Given a list of dates, returns the matching days in calendar order. Months not yet cached
+        are loaded with a single query; dates not present in the calendar are skipped.
+        """
+        try:
+            months = self._load_months({self._month_key(date) for date in dates})
+            wanted = set(dates)
+            return [
+                day
+                for key in sorted(months)
+                for day in months[key]
+                if day["date_string"] in wanted
+            ]
+        except Exception:
+            console.print_exception()
+
+    @synchronized
+    @traced
+    def get_days_range(self, start: str, end: str) -> Optional[list[Day]]:
+        """
+        Returns every day between start and end (inclusive, as date strings) in calendar order.
+        Served from the month cache, loading any missing months with a single query.
+        """
+        try:
+            months = self._load_months(self._months_between(start, end))
+            return [
+                day
+                for key in sorted(months)
+                for day in months[key]
+                if start <= day["date_string"] <= end
+            ]
+        except Exception:
+            console.print_exception()
+
+    def _load_months(self, months: Iterable[MonthKey]) -> dict[MonthKey, list[Day]]:
+        """
+        Returns the rows of each requested month, loading the months not already cached with one
+        BETWEEN query per run of consecutive missing months, so far apart dates don't drag in
+        every month between them.
         """
-        Given a job name, returns row object.
+        rows_by_month: dict[MonthKey, list[Day]] = {}
+        missing = []
+        for year, month in months:
+            days = self.cache.get_month(year, month)
+            if days is None:
+                missing.append((year, month))
+                rows_by_month[(year, month)] = []
+            else:
+                rows_by_month[(year, month)] = days
+        if not missing:
+            return rows_by_month
+
+        missing.sort()
+        missing_keys = set(missing)
+        for first, last in self._month_runs(missing):
+            self.cursor.execute(f"""
+                SELECT c.*, {WORTH_SQL} AS worth
+                FROM calendar AS c LEFT JOIN jobs AS j ON j.job_name = ?
+                WHERE c.date_string BETWEEN ? AND ? ORDER BY c.date_string
+            """, (
+                self.DEFAULT_JOB_NAME,
+                f"{first[0]:04}-{first[1]:02}-01",
+                f"{last[0]:04}-{last[1]:02}-31",
+            ))
+            for day in self._rows_to_days(self.cursor):
+                key = (day["year"], day["month"])
+                if key in missing_keys:
+                    # Overlay writes that are still queued so reads never go backwards.
+                    pending = self._pending_days.get(day["date_string"])
+                    if pending:
+                        day.update(pending)
+                        if DIFFERENTIAL_COLUMNS.keys() & pending.keys():
+                            day["worth"] = day_worth(day, self.get_job(self.DEFAULT_JOB_NAME))
+                    rows_by_month[key].append(day)
+        for year, month in missing:
+            self.cache.put_month(year, month, rows_by_month[(year, month)])
+        return rows_by_month
+
+    @staticmethod
+    def _month_key(date_string: str) -> MonthKey:
+        return int(date_string[:4]), int(date_string[5:7])
+
+    @staticmethod
+    def _month_runs(months: list[MonthKey]) -> list[tuple[MonthKey, MonthKey]]:
+        """Splits sorted months into (first, last) runs of consecutive months."""
+        runs = []
+        for year, month in months:
+            if runs:
+                last_year, last_month = runs[-1][1]
+                if (year, month) == ((last_year + 1, 1) if last_month == 12 else (last_year, last_month + 1)):
+                    runs[-1] = (runs[-1][0], (year, month))
+                    continue
+            runs.append(((year, month), (year, month)))
+        return runs
+
+    @classmethod
+    def _months_between(cls, start: str, end: str) -> list[MonthKey]:
+        """Lists every (year, month) from start's month to end's month inclusive."""
+        year, month = cls._month_key(start)
+        last = cls._month_key(end)
+        months = []
+        while (year, month) <= last:
+            months.append((year, month))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return months
+
+    @staticmethod
+    def _rows_to_days(cursor: sqlite3.Cursor) -> list[Day]:
+        """Converts the rows of an executed calendar query into Day records."""
+        return [Day.from_row(row) for row in cursor.fetchall()]
+
+    @synchronized
+    @traced
+    def get_year_store(self, year: int) -> Optional[YearStore]:
+        """
+        Returns a columnar YearStore of a year's worth and working days, read with one query that
+        skips building a Day per row. Queued writes are overlaid like any other read.
+        """
+        try:
+            self.cursor.execute(f"""
+                SELECT c.year, c.month, c.day, c.is_working, {WORTH_SQL} AS worth
+                FROM calendar AS c LEFT JOIN jobs AS j ON j.job_name = ?
+                WHERE c.year = ?
+            """, (self.DEFAULT_JOB_NAME, year))
+            store = YearStore.from_days(year, self.cursor.fetchall())
+            pending = [date_string for date_string in self._pending_days if date_string.startswith(f"{year:04}-")]
+            for day in self.get_days(pending) if pending else ():
+                day_date = datetime.date(day.year, day.month, day.day)
+                store.set_working(day_date, day.is_working)
+                store.set_worth(day_date, day.worth)
+            return store
+        except Exception:
+            console.print_exception()
+
+    @synchronized
+    @traced
+    def get_job(self, job_name: str) -> Optional[dict[str, str | int | float]]:
+        """
+        Given a job name, returns the job as a dict, served from the cache after the first read.
         Columns:
             id: int
             job_name: str
@@ -137,15 +878,24 @@ class DatabaseManager:
             night_rate: float
             critical_rate: float
         """
+        job = self.cache.get_job(job_name)
+        if job is not None:
+            return job
         try:
-            self._cursor.execute(f"""
+            self.cursor.execute(f"""
                 SELECT * FROM jobs WHERE job_name = ?
             """, (job_name,))
-            row = self._cursor.fetchone()
-            return row
+            row = self.cursor.fetchone()
+            if row:
+                job = dict(row)
+                self.cache.put_job(job_name, job)
+            return job
         except Exception:
             console.print_exception()
 
+    @synchronized
+    @traced
+    @retry_on_busy
     def insert_job(
             self,
             job_name: str,
@@ -156,88 +906,494 @@ class DatabaseManager:
             critical_rate: float
         ) -> None:
         try:
-            self._cursor.execute(f"""
+            self.cursor.execute(f"""
                 INSERT INTO jobs (
                     job_name, hourly_rate, overtime_rate, weekend_rate, night_rate, critical_rate
                 ) VALUES (?, ?, ?, ?, ?, ?)
                 ON CONFLICT (job_name) DO NOTHING
             """, (job_name, hourly_rate, overtime_rate, weekend_rate, night_rate, critical_rate))
-            self._connection.commit()
-        except Exception:
+            self.connection.commit()
+        except Exception as error:
+            if is_busy(error):
+                raise
             console.print_exception()
 
+    @synchronized
+    @traced
     def insert_year(self, year: int) -> None:
         """
         Writes year data to table for calendar use.
         """
-        date_list = []
-        start_date = datetime.date(year, 1, 1)
-        end_date = datetime.date(year, 12, 31)
-        job = self.get_job(self.DEFAULT_JOB_NAME)
-
-        current_date: datetime.datetime = start_date
-        while current_date <= end_date:
-            is_weekend = bool(current_date.weekday() >= 5)
-            day_data = {
-                "date_string": str(current_date),
-                "year": current_date.year,
-                "month": current_date.month,
-                "day": current_date.day,
-                "is_weekend": is_weekend,
-                "is_working": False,
-                "is_overtime": False,
-                "worth": (job["hourly_rate"] * 12) + ((job["weekend_rate"] * 12) if is_weekend else 0)
-            }
-            date_list.append(day_data)
-            current_date += timedelta(days=1)
+        self.insert_years((year,))
 
+    @synchronized
+    @traced
+    @retry_on_busy
+    def insert_years(self, years: Iterable[int]) -> Optional[ProvisionReport]:
+        """
+        Writes every missing year in years to the calendar table in a single transaction. Years
+        already present are found with one query and skipped.
+        """
+        start_time = time.perf_counter()
+        years = sorted(set(years))
         try:
-            self._cursor.executemany(f"""
-                INSERT INTO calendar (
-                    date_string, year, month, day, is_weekend, is_working, is_overtime, worth
-                ) VALUES (:date_string, :year, :month, :day, :is_weekend, :is_working, :is_overtime, :worth)
-                ON CONFLICT (date_string) DO NOTHING
-            """, date_list)
-            self._connection.commit()
-        except Exception:
+            existing = self.existing_years(years)
+            missing = [year for year in years if year not in existing]
+            days_inserted = 0
+            if missing:
+                with self.connection:
+                    days_inserted = self._insert_calendar_years(missing)
+                for year in missing:
+                    self.cache.invalidate_year(year)
+                self._earnings_indexes.clear()
+                self._known_years.update(missing)
+            return ProvisionReport(
+                years_inserted=missing,
+                years_skipped=sorted(existing),
+                days_inserted=days_inserted,
+                elapsed_ms=(time.perf_counter() - start_time) * 1000,
+            )
+        except Exception as error:
+            if is_busy(error):
+                raise
             console.print_exception()
 
+    def _insert_calendar_years(self, years: list[int]) -> int:
+        """
+        Writes every day of years to the calendar table, logging one change per year rather than
+        one per day. Runs inside the caller's transaction.
+        """
+        self._cursor.executemany(f"""
+            INSERT INTO calendar (
+                date_string, year, month, day, is_weekend, is_working, is_overtime
+            ) VALUES (?, ?, ?, ?, ?, 0, 0)
+            ON CONFLICT (date_string) DO NOTHING
+        """, self._year_rows(years))
+        days_inserted = self._cursor.rowcount
+        self._cursor.executemany(
+            "INSERT INTO calendar_changes (date_string) VALUES (?)", [(f"{year:04}",) for year in years]
+        )
+        return days_inserted
+
+    @staticmethod
+    def _year_rows(years: list[int]) -> Iterator[tuple]:
+        """Yields calendar rows for every day of the given years."""
+        for year in years:
+            first = datetime.date(year, 1, 1).toordinal()
+            last = datetime.date(year, 12, 31).toordinal()
+            for ordinal in range(first, last + 1):
+                current_date = datetime.date.fromordinal(ordinal)
+                yield (
+                    current_date.isoformat(),
+                    year,
+                    current_date.month,
+                    current_date.day,
+                    current_date.weekday() >= 5,
+                )
+
+    @synchronized
+    @traced
+    @retry_on_busy
     def update_day(self, date_string: str, column: str, value: str | int | bool) -> None:
+        if self.write_behind:
+            # Later updates to the same day and column replace earlier ones.
+            self._pending_days.setdefault(date_string, {})[column] = value
+            self._update_cached_day(date_string, column, value)
+            return
         try:
-            self._cursor.execute(f"""
-                UPDATE calendar SET {column} = ? WHERE date_string = ?
-            """, (value, date_string))
-            self._connection.commit()
-        except Exception:
+            with self.connection:
+                self.cursor.execute(f"""
+                    UPDATE calendar SET {column} = ? WHERE date_string = ?
+                """, (value, date_string))
+                self._sync_shifts(column, [(date_string, value)])
+                self._prune_change_log()
+            self._update_cached_day(date_string, column, value)
+        except Exception as error:
+            if is_busy(error):
+                raise
+            # The earnings index may hold days from the rolled back transaction.
+            self._earnings_indexes.clear()
             console.print_exception()
 
+    def _update_cached_day(self, date_string: str, column: str, value: str | int | bool) -> None:
+        """Writes a change through to the cache, re-deriving worth if a differential changed."""
+        self.cache.update_day(date_string, column, value)
+        if column in DIFFERENTIAL_COLUMNS:
+            day = self.cache.get_day(date_string)
+            if day is not None:
+                day["worth"] = day_worth(day, self.get_job(self.DEFAULT_JOB_NAME))
+
+    @property
+    def has_pending_writes(self) -> bool:
+        return bool(self._pending_days)
+
+    @synchronized
+    def discard_pending_writes(self) -> int:
+        """Drops every queued day update, and the cached months showing them. Returns how many."""
+        for date_string in self._pending_days:
+            self.cache.invalidate_month(*self._month_key(date_string))
+        discarded = len(self._pending_days)
+        self._pending_days = {}
+        return discarded
+
+    @synchronized
+    @traced
+    @retry_on_busy(reraise=True)
+    def flush(self) -> int:
+        """
+        Writes every queued day update in a single transaction. Returns the number of days written.
+        If the write fails the queue is kept, so a later flush can try again, and the error is
+        raised for the caller to report.
+        """
+        if not self._pending_days:
+            return 0
+        pending = self._pending_days
+        updates_by_column: dict[str, list[tuple]] = {}
+        for date_string, columns in pending.items():
+            for column, value in columns.items():
+                updates_by_column.setdefault(column, []).append((value, date_string))
+        try:
+            with self.connection:
+                for column, updates in updates_by_column.items():
+                    self.cursor.executemany(f"""
+                        UPDATE calendar SET {column} = ? WHERE date_string = ?
+                    """, updates)
+                for column, updates in updates_by_column.items():
+                    self._sync_shifts(column, [(date_string, value) for value, date_string in updates])
+                self._prune_change_log()
+        except Exception:
+            # The earnings index may hold days from the rolled back transaction.
+            self._earnings_indexes.clear()
+            raise
+        self._pending_days = {}
+        return len(pending)
+
+    @synchronized
+    @traced
+    @retry_on_busy
     def update_job(self, job_name: str, column: str, value: str | float) -> None:
         try:
-            self._cursor.execute(f"""
+            self.cursor.execute(f"""
             UPDATE jobs SET {column} = ? WHERE job_name = ?
         """, (value, job_name))
+            self.connection.commit()
+            self.cache.update_job(job_name, column, value)
+            # Cached worth was derived from the old rates. Only cached months are touched, so
+            # this costs the same however many years are stored.
+            self.cache.clear_days()
+            self._earnings_indexes.clear()
+        except Exception as error:
+            if is_busy(error):
+                raise
+            console.print_exception()
+
+    def _prune_change_log(self) -> None:
+        """Keeps only the newest CHANGE_LOG_ROWS of calendar_changes. Runs inside the caller's transaction."""
+        self.cursor.execute(f"""
+            DELETE FROM calendar_changes WHERE id <= (SELECT MAX(id) FROM calendar_changes) - ?
+        """, (CHANGE_LOG_ROWS,))
+
+    @synchronized
+    def poll_changes(self) -> Optional[CalendarChanges]:
+        """
+        Checks whether another connection has committed since the last poll, which costs one
+        PRAGMA data_version while nothing changes. If it has, drops the changed months from the
+        cache, along with anything derived from them, and returns what changed.
+        """
+        if not self.is_connected:
+            return None
+        try:
+            data_version = self._cursor.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return None
+            self._data_version = data_version
+            self._cursor.execute(
+                "SELECT id, date_string FROM calendar_changes WHERE id > ? ORDER BY id", (self._change_log_id,)
+            )
+            rows = self._cursor.fetchall()
+            if not rows:
+                return None
+            # A gap before the first unseen row means the log was pruned past this connection.
+            everything = rows[0]["id"] > self._change_log_id + 1
+            everything = everything or any(row["date_string"] is None for row in rows)
+            self._change_log_id = rows[-1]["id"]
+            # Provisioned years are logged as a bare YYYY and change every month of the year.
+            months = frozenset(
+                month
+                for row in rows if row["date_string"] is not None
+                for month in (
+                    [(int(row["date_string"]), month) for month in range(1, 13)]
+                    if len(row["date_string"]) == 4 else [self._month_key(row["date_string"])]
+                )
+            )
+
+            if everything:
+                self.cache.clear()
+            for year, month in months:
+                self.cache.invalidate_month(year, month)
+            self._known_years.clear()
+            self._earnings_indexes.clear()
+            self._expense_schedule = None
+            return CalendarChanges(months, everything)
         except Exception:
             console.print_exception()
 
+    @synchronized
+    @traced
     def year_exists(self, year: int) -> bool:
         """
         Checks if table is present and contains a day entry for given year.
         """
-        table_name = f"calendar"
+        return year in self.existing_years((year,))
+
+    @synchronized
+    @traced
+    def existing_years(self, years: Iterable[int]) -> set[int]:
+        """
+        Returns which of the given years already have a day entry, using one query. Years seen
+        before are answered from memory.
+        """
+        years = set(years)
+        if years <= self._known_years:
+            return years
+
+        unknown = sorted(years - self._known_years)
+        placeholders = ", ".join("?" for _ in unknown)
+        self.cursor.execute(f"""
+            SELECT year FROM calendar WHERE date_string IN ({placeholders})
+        """, [f"{year:04}-01-01" for year in unknown])
+        self._known_years.update(row[0] for row in self.cursor.fetchall())
+        return years & self._known_years
+
+    def export_rows(self, table: str) -> Iterator[sqlite3.Row]:
+        """
+        Yields every row of table with its TRANSFER_COLUMNS, fetched TRANSFER_CHUNK_ROWS at a time
+        on a cursor of its own so an export of any size holds one chunk in memory. Queued writes
+        are flushed first.
+        """
+        if table not in EXPORT_SQL:
+            raise ValueError(f"Unknown table {table!r}, expected one of {tuple(EXPORT_SQL)}")
+        with self._lock:
+            self.flush()
+            cursor = self.connection.execute(EXPORT_SQL[table])
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(TRANSFER_CHUNK_ROWS)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    @synchronized
+    @traced
+    def import_rows(self, table: str, rows: Iterable[dict[str, str | int | float | bool | None]]) -> int:
+        """
+        Writes rows keyed by TRANSFER_COLUMNS into table, TRANSFER_CHUNK_ROWS per executemany, in
+        a single transaction so a bad row leaves the db untouched. rows is consumed lazily, so it
+        can stream straight from a file. Returns the number of rows read, and raises whatever
+        stopped the import after rolling it back.
+
+        Calendar rows set whichever flags they carry on an existing date, adding missing years
+        first. Jobs are matched on job_name and expenses on id, updating rows that exist. Shifts
+        are matched on job and start time. For the default job they mark their days as worked,
+        replace the day's default shift and set its night and critical flags to match.
+        Shifts, pay summaries and cached days are kept in step as with update_day. Not retried
+        when busy, since rows can only be read once.
+        """
+        if table not in TRANSFER_COLUMNS:
+            raise ValueError(f"Unknown table {table!r}, expected one of {tuple(TRANSFER_COLUMNS)}")
+        importer = getattr(self, f"_import_{table}")
+        # Queued day updates would otherwise land on top of the import.
+        self.flush()
+        count = 0
+        try:
+            with self.connection:
+                for chunk in itertools.batched(rows, TRANSFER_CHUNK_ROWS):
+                    importer(chunk)
+                    count += len(chunk)
+                self._prune_change_log()
+        except Exception:
+            # Everything derived from the rolled back rows goes, then the caller hears why.
+            self._earnings_indexes.clear()
+            self._known_years.clear()
+            self._expense_schedule = None
+            self.cache.clear()
+            raise
+        return count
+
+    def _ensure_years(self, date_strings: Iterable[str]) -> None:
+        """Adds any year of date_strings missing from the calendar. Runs inside the caller's transaction."""
+        years = {int(date_string[:4]) for date_string in date_strings}
+        missing = sorted(years - self.existing_years(years))
+        if missing:
+            self._insert_calendar_years(missing)
+            self._known_years.update(missing)
+            for year in missing:
+                self.cache.invalidate_year(year)
+
+    def _import_calendar(self, rows: tuple[dict, ...]) -> None:
+        self._ensure_years(row["date_string"] for row in rows)
+        updates_by_column: dict[str, list[tuple]] = {}
+        for row in rows:
+            for column in TRANSFER_COLUMNS["calendar"][1:]:
+                if row.get(column) is not None:
+                    updates_by_column.setdefault(column, []).append((row[column], row["date_string"]))
+        for column, updates in updates_by_column.items():
+            self._cursor.executemany(f"""
+                UPDATE calendar SET {column} = ? WHERE date_string = ?
+            """, updates)
+        for column, updates in updates_by_column.items():
+            self._sync_shifts(column, [(date_string, value) for value, date_string in updates])
+            for value, date_string in updates:
+                self._update_cached_day(date_string, column, value)
+
+    def _import_jobs(self, rows: tuple[dict, ...]) -> None:
+        columns = TRANSFER_COLUMNS["jobs"]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+        self._cursor.executemany(f"""
+            INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+            ON CONFLICT (job_name) DO UPDATE SET {updates}
+        """, [tuple(row[column] for column in columns) for row in rows])
+        # Cached jobs, worth and earnings were all derived from the old rates.
+        self.cache.clear()
+        self._earnings_indexes.clear()
+
+    def _import_expenses(self, rows: tuple[dict, ...]) -> None:
+        columns = TRANSFER_COLUMNS["expenses"]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+        self._cursor.executemany(f"""
+            INSERT INTO expenses ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+            ON CONFLICT (id) DO UPDATE SET {updates}
+        """, [tuple(row.get(column) for column in columns) for row in rows])
+        self._expense_schedule = None
+
+    def _import_shifts(self, rows: tuple[dict, ...]) -> None:
+        job_ids = {}
+        for job_name in {row["job_name"] for row in rows}:
+            job = self._cursor.execute("SELECT id FROM jobs WHERE job_name = ?", (job_name,)).fetchone()
+            if job is None:
+                raise ValueError(f"Shift for unknown job {job_name!r}")
+            job_ids[job_name] = job["id"]
+        self._ensure_years(row["start_time"][:10] for row in rows)
+        self._cursor.executemany("""
+            INSERT INTO shifts (job_id, start_time, end_time, is_night, is_critical)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (job_id, start_time) DO UPDATE SET
+                end_time = excluded.end_time,
+                is_night = excluded.is_night,
+                is_critical = excluded.is_critical
+        """, [
+            (job_ids[row["job_name"]], row["start_time"], row["end_time"],
+             row.get("is_night") or 0, row.get("is_critical") or 0)
+            for row in rows
+        ])
+
+        dates_by_job: dict[str, set[str]] = {}
+        for row in rows:
+            dates_by_job.setdefault(row["job_name"], set()).add(row["start_time"][:10])
+        # The calendar shows the default job, so its shift days are worked days, flagged night or
+        # critical if an imported shift is. Written directly rather than through _sync_shifts,
+        # which would add a default shift beside the imported one.
+        flags: dict[str, dict[str, bool]] = {}
+        default_starts = set()
+        for row in rows:
+            if row["job_name"] == self.DEFAULT_JOB_NAME:
+                day_flags = flags.setdefault(row["start_time"][:10], {"is_night": False, "is_critical": False})
+                day_flags["is_night"] = day_flags["is_night"] or bool(row.get("is_night"))
+                day_flags["is_critical"] = day_flags["is_critical"] or bool(row.get("is_critical"))
+                default_starts.add(row["start_time"])
+        if flags:
+            # A day toggled working already has the default shift, which the imported one replaces.
+            job_id = job_ids[self.DEFAULT_JOB_NAME]
+            self._cursor.executemany("""
+                DELETE FROM shifts WHERE job_id = ? AND start_time = ?
+            """, [
+                (job_id, start_time)
+                for start_time in (f"{date_string} {DEFAULT_SHIFT_START}" for date_string in flags)
+                if start_time not in default_starts
+            ])
+            self._cursor.executemany("""
+                UPDATE calendar SET is_working = 1, is_night = :is_night, is_critical = :is_critical
+                WHERE date_string = :date_string
+                    AND (NOT is_working OR is_night != :is_night OR is_critical != :is_critical)
+            """, [{"date_string": date_string, **day_flags} for date_string, day_flags in flags.items()])
+            for date_string, day_flags in flags.items():
+                self._update_cached_day(date_string, "is_working", True)
+                for column, value in day_flags.items():
+                    self._update_cached_day(date_string, column, value)
+        for job_name, dates in dates_by_job.items():
+            self._refresh_summaries(job_ids[job_name], dates)
+            self._refresh_earnings_index(job_name, sorted(dates))
+
+
+class DatabaseRegistry:
+    """
+    Process-wide provider of DatabaseManagers. Hands out one shared manager per db file so that
+    every screen and widget borrows the same connection and cache. Connections open lazily on
+    the first query.
+    """
+
+    def __init__(
+            self,
+            default_path: str = "db/calendar.db",
+            write_behind: bool = False,
+            profile: Optional[ConnectionProfile] = None
+        ) -> None:
+        self.default_path = default_path
+        self.write_behind = write_behind
+        self.profile = profile
+        self._managers: dict[str, DatabaseManager] = {}
+        self._async_managers: dict[str, "AsyncDatabaseManager"] = {}
+
+    def get(self, db_path: Optional[str] = None) -> DatabaseManager:
+        """Returns the shared manager for db_path, creating it without connecting if needed."""
+        db_path = db_path or self.default_path
+        manager = self._managers.get(db_path)
+        if manager is None:
+            manager = DatabaseManager(db_path, write_behind=self.write_behind, profile=self.profile)
+            self._managers[db_path] = manager
+        return manager
+
+    def get_async(self, db_path: Optional[str] = None) -> "AsyncDatabaseManager":
+        """Returns the shared awaitable facade over the manager for db_path."""
+        from async_database import AsyncDatabaseManager
+
+        db_path = db_path or self.default_path
+        async_manager = self._async_managers.get(db_path)
+        if async_manager is None:
+            async_manager = AsyncDatabaseManager(self.get(db_path))
+            self._async_managers[db_path] = async_manager
+        return async_manager
+
+    async def flush_all(self) -> None:
+        """Flushes queued writes for every manager on its db thread."""
+        for db_path, manager in self._managers.items():
+            if manager.has_pending_writes:
+                try:
+                    await self.get_async(db_path).flush()
+                except Exception:
+                    # The writes stay queued for the next flush.
+                    console.print_exception()
+
+    async def poll_changes(self) -> dict[str, CalendarChanges]:
+        """Polls every open db on its db thread, returning what changed keyed by db path."""
+        changes = {}
+        for db_path, manager in self._managers.items():
+            if manager.is_connected:
+                db_changes = await self.get_async(db_path).poll_changes()
+                if db_changes is not None:
+                    changes[db_path] = db_changes
+        return changes
+
+    def close_all(self) -> None:
+        """Drains the db threads, then flushes and closes every open connection."""
+        for async_manager in self._async_managers.values():
+            async_manager.close()
+        for manager in self._managers.values():
+            manager.close()
 
-        self._cursor.execute(f"""
-            SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';
-        """)
-        if not self._cursor.fetchone():
-            return False
-        
-        self._cursor.execute(f"""
-            SELECT date_string FROM calendar WHERE date_string = ?
-        """, [f"{year}-01-01"])
-        if not self._cursor.fetchone():
-            return False
-        
-        return True
 
 if __name__ == "__main__":
     # Initialize timers
@@ -0,0 +1,110 @@
+from array import array
+from datetime import date, timedelta
+from typing import Iterable
+
+
+class FenwickTree:
+    """Binary indexed tree of floats: point updates and prefix sums in O(log n)."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._tree = array("d", bytes(8 * (size + 1)))
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> "FenwickTree":
+        """Builds a tree over values in O(n)."""
+        values = list(values)
+        tree = cls(len(values))
+        for position, value in enumerate(values, start=1):
+            tree._tree[position] += value
+            parent = position + (position & -position)
+            if parent <= tree.size:
+                tree._tree[parent] += tree._tree[position]
+        return tree
+
+    def add(self, index: int, delta: float) -> None:
+        position = index + 1
+        while position <= self.size:
+            self._tree[position] += delta
+            position += position & -position
+
+    def prefix_sum(self, index: int) -> float:
+        """Sum of values 0 through index inclusive."""
+        total = 0.0
+        position = min(index + 1, self.size)
+        while position > 0:
+            total += self._tree[position]
+            position -= position & -position
+        return total
+
+    def range_sum(self, first: int, last: int) -> float:
+        """Sum of values first through last inclusive."""
+        if last < first:
+            return 0.0
+        return self.prefix_sum(last) - (self.prefix_sum(first - 1) if first > 0 else 0.0)
+
+
+class EarningsIndex:
+    """
+    Cumulative hours and straight-time worth per day for one job, from origin onwards. Any range
+    total is two prefix sums and updating a day is O(log n), so year-to-date and multi-year
+    totals cost the same however much history is stored. Overtime premiums depend on the whole
+    week and are left to the pay summaries.
+    """
+
+    def __init__(self, origin: date, days: int) -> None:
+        self.origin = origin
+        self.days = days
+        self._hours = FenwickTree(days)
+        self._worth = FenwickTree(days)
+        self._day_hours = array("d", bytes(8 * days))
+        self._day_worth = array("d", bytes(8 * days))
+
+    @classmethod
+    def from_days(cls, origin: date, days: int, totals: Iterable[tuple[str, float, float]]) -> "EarningsIndex":
+        """Builds an index from (date_string, hours, worth) per worked day in O(n)."""
+        index = cls(origin, days)
+        for date_string, hours, worth in totals:
+            position = index.position(date.fromisoformat(date_string))
+            if position is not None:
+                index._day_hours[position] += hours
+                index._day_worth[position] += worth
+        index._hours = FenwickTree.from_values(index._day_hours)
+        index._worth = FenwickTree.from_values(index._day_worth)
+        return index
+
+    @property
+    def last_day(self) -> date:
+        return self.origin + timedelta(days=self.days - 1)
+
+    def position(self, day: date) -> int | None:
+        """Index of a day in the trees, or None if the index doesn't cover it."""
+        position = (day - self.origin).days
+        return position if 0 <= position < self.days else None
+
+    def set_day(self, day: date, hours: float, worth: float) -> bool:
+        """Replaces a day's totals. Returns False if the day is outside the index."""
+        position = self.position(day)
+        if position is None:
+            return False
+        self._hours.add(position, hours - self._day_hours[position])
+        self._worth.add(position, worth - self._day_worth[position])
+        self._day_hours[position] = hours
+        self._day_worth[position] = worth
+        return True
+
+    def totals(self, start: date, end: date) -> tuple[float, float]:
+        """(hours, worth) from start to end inclusive, clipped to the index."""
+        first = max((start - self.origin).days, 0)
+        last = min((end - self.origin).days, self.days - 1)
+        return self._hours.range_sum(first, last), self._worth.range_sum(first, last)
+
+    def hours_between(self, start: date, end: date) -> float:
+        return self.totals(start, end)[0]
+
+    def worth_between(self, start: date, end: date) -> float:
+        return self.totals(start, end)[1]
+
+    def year_to_date(self, today: date) -> tuple[float, float]:
+        """(hours, worth) from January 1st through today."""
+        return self.totals(date(today.year, 1, 1), today)
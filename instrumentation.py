@@ -0,0 +1,154 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+# Every call site currently being timed in this context, outermost first.
+_active_sites: contextvars.ContextVar[tuple[str, ...]] = contextvars.ContextVar("active_sites", default=())
+
+
+class Histogram:
+    """Latency histogram with fixed millisecond buckets, plus running count, total and max."""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile_ms(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given percentile, capped at the max seen."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return min(LATENCY_BUCKETS_MS[index], self.max_ms)
+                break
+        return self.max_ms
+
+    def as_dict(self) -> dict[str, Any]:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "mean_ms": self.mean_ms,
+            "p50_ms": self.percentile_ms(0.5),
+            "p95_ms": self.percentile_ms(0.95),
+            "max_ms": self.max_ms,
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class QueryStats:
+    """
+    Process-wide counters of SQL statements and call latencies by call site. Statements are
+    counted against every site active when they run, so a UI action such as a month switch
+    reports all of the queries it caused.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = True
+        self.statements_total = 0
+        self.statements: dict[str, int] = {}
+        self.latencies: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def trace_statement(self, statement: str) -> None:
+        """SQLite trace callback, called once for every statement a connection executes."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.statements_total += 1
+            for site in _active_sites.get() or ("<untraced>",):
+                self.statements[site] = self.statements.get(site, 0) + 1
+
+    @contextmanager
+    def timed(self, site: str) -> Iterator[None]:
+        """Times the enclosed block under site and attributes its statements to it."""
+        if not self.enabled:
+            yield
+            return
+        token = _active_sites.set(_active_sites.get() + (site,))
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            _active_sites.reset(token)
+            with self._lock:
+                self.latencies.setdefault(site, Histogram()).record(elapsed_ms)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.statements_total = 0
+            self.statements.clear()
+            self.latencies.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            sites = sorted(set(self.statements) | set(self.latencies))
+            return {
+                "statements_total": self.statements_total,
+                "sites": {
+                    site: {
+                        "statements": self.statements.get(site, 0),
+                        **self.latencies.get(site, Histogram()).as_dict(),
+                    }
+                    for site in sites
+                },
+            }
+
+    def dump(self, path: str) -> None:
+        """Writes a snapshot to path as JSON."""
+        with open(path, "w") as stats_file:
+            json.dump(self.snapshot(), stats_file, indent=2)
+
+
+stats = QueryStats()
+
+
+def traced(func):
+    """Times every call of a function, coroutine or generator under its qualified name."""
+    site = func.__qualname__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with stats.timed(site):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            with stats.timed(site):
+                return (yield from func(*args, **kwargs))
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stats.timed(site):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,226 @@
+from typing import TYPE_CHECKING, Callable
+
+from payroll import SHIFT_HOURS
+
+if TYPE_CHECKING:
+    from database_manager import DatabaseManager
+
+Migration = Callable[["DatabaseManager"], None]
+
+# Every schema change in order. A db's PRAGMA user_version is the number of these it has applied,
+# so new changes are only ever appended.
+MIGRATIONS: list[Migration] = []
+
+# Day toggles are recorded as one default shift starting at this time on the toggled date.
+DEFAULT_SHIFT_START = "07:00:00"
+
+
+def migration(func: Migration) -> Migration:
+    MIGRATIONS.append(func)
+    return func
+
+
+def schema_version(db_manager: "DatabaseManager") -> int:
+    return db_manager._cursor.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_manager: "DatabaseManager") -> list[str]:
+    """
+    Applies every migration the db hasn't seen, each in its own transaction together with the
+    version bump, and returns their names. Older dbs upgrade in place the first time they are
+    opened. Each step takes the write lock up front and rechecks the version, so two instances
+    opening the same db at once apply it only once.
+    """
+    version = schema_version(db_manager)
+    if version > len(MIGRATIONS):
+        raise RuntimeError(
+            f"{db_manager.db_path} is at schema version {version}, newer than the {len(MIGRATIONS)} this build knows"
+        )
+    applied = []
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        with db_manager._connection:
+            # DDL doesn't open a transaction implicitly, so begin one to keep each step atomic.
+            db_manager._cursor.execute("BEGIN IMMEDIATE")
+            if schema_version(db_manager) >= number:
+                continue
+            step(db_manager)
+            db_manager._cursor.execute(f"PRAGMA user_version = {number}")
+        applied.append(step.__name__)
+    return applied
+
+
+def table_columns(db_manager: "DatabaseManager", table: str) -> set[str]:
+    return {row[1] for row in db_manager._cursor.execute(f"PRAGMA table_info({table})")}
+
+
+@migration
+def create_tables(db_manager: "DatabaseManager") -> None:
+    """Jobs, calendar days and expenses."""
+    cursor = db_manager._cursor
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY ASC,
+            job_name TEXT NOT NULL UNIQUE,
+            hourly_rate REAL NOT NULL,
+            overtime_rate REAL NOT NULL,
+            weekend_rate REAL NOT NULL,
+            night_rate REAL NOT NULL,
+            critical_rate REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS calendar (
+            date_string TEXT PRIMARY KEY NOT NULL,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            is_weekend BOOL NOT NULL,
+            is_working BOOL NOT NULL,
+            is_overtime BOOL NOT NULL,
+            is_night BOOL NOT NULL DEFAULT 0,
+            is_critical BOOL NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY ASC,
+            daily BOOL NOT NULL,
+            weekly BOOL NOT NULL,
+            biweekly BOOL NOT NULL,
+            monthly BOOL NOT NULL,
+            day INTEGER,
+            amount REAL NOT NULL,
+            name TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT
+        )
+    """)
+
+
+@migration
+def derive_day_worth(db_manager: "DatabaseManager") -> None:
+    """
+    Adds the night and critical differential flags to calendars made before them, and drops the
+    precomputed worth column, which is now derived from job rates on read.
+    """
+    columns = table_columns(db_manager, "calendar")
+    for column in ("is_night", "is_critical"):
+        if column not in columns:
+            db_manager._cursor.execute(f"ALTER TABLE calendar ADD COLUMN {column} BOOL NOT NULL DEFAULT 0")
+    if "worth" in columns:
+        db_manager._cursor.execute("ALTER TABLE calendar DROP COLUMN worth")
+
+
+@migration
+def create_shifts(db_manager: "DatabaseManager") -> None:
+    """
+    Shifts hold the actual hours worked, with times as 'YYYY-MM-DD HH:MM:SS' text indexed by job
+    and start time. Every day already marked as working gets one default shift.
+    """
+    cursor = db_manager._cursor
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shifts (
+            id INTEGER PRIMARY KEY ASC,
+            job_id INTEGER NOT NULL REFERENCES jobs (id),
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            is_night BOOL NOT NULL DEFAULT 0,
+            is_critical BOOL NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS shifts_job_start ON shifts (job_id, start_time)")
+    cursor.execute(f"""
+        INSERT INTO shifts (job_id, start_time, end_time, is_night, is_critical)
+        SELECT j.id, c.date_string || ' {DEFAULT_SHIFT_START}',
+            datetime(c.date_string || ' {DEFAULT_SHIFT_START}', '+{SHIFT_HOURS} hours'),
+            c.is_night, c.is_critical
+        FROM calendar AS c JOIN jobs AS j ON j.job_name = ?
+        WHERE c.is_working
+        ON CONFLICT DO NOTHING
+    """, (db_manager.DEFAULT_JOB_NAME,))
+
+
+@migration
+def create_pay_summaries(db_manager: "DatabaseManager") -> None:
+    """The week, period, month and year rollup of shifts, built from any shifts already stored."""
+    cursor = db_manager._cursor
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pay_summaries (
+            job_id INTEGER NOT NULL REFERENCES jobs (id),
+            level TEXT NOT NULL,
+            period_key TEXT NOT NULL,
+            parent_key TEXT,
+            year INTEGER NOT NULL,
+            hours REAL NOT NULL DEFAULT 0,
+            overtime_hours REAL NOT NULL DEFAULT 0,
+            night_hours REAL NOT NULL DEFAULT 0,
+            weekend_hours REAL NOT NULL DEFAULT 0,
+            critical_hours REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, level, period_key)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS pay_summaries_parent ON pay_summaries (job_id, level, parent_key)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS pay_summaries_year ON pay_summaries (job_id, level, year)")
+    db_manager._rebuild_summaries()
+
+
+@migration
+def index_calendar(db_manager: "DatabaseManager") -> None:
+    """Indexes for month and year lookups, and a partial index over just the working days."""
+    cursor = db_manager._cursor
+    cursor.execute("CREATE INDEX IF NOT EXISTS calendar_year_month ON calendar (year, month)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS calendar_working ON calendar (date_string) WHERE is_working")
+
+
+@migration
+def log_calendar_changes(db_manager: "DatabaseManager") -> None:
+    """
+    Triggers append every changed day to calendar_changes so other instances can tell which months
+    to reload. New years log only the first of each month, and a NULL date means a job changed
+    and every day's worth with it.
+    """
+    cursor = db_manager._cursor
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS calendar_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date_string TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS calendar_changes_update AFTER UPDATE ON calendar
+        BEGIN
+            INSERT INTO calendar_changes (date_string) VALUES (NEW.date_string);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS calendar_changes_insert AFTER INSERT ON calendar
+        WHEN NEW.day = 1
+        BEGIN
+            INSERT INTO calendar_changes (date_string) VALUES (NEW.date_string);
+        END
+    """)
+    for event in ("INSERT", "UPDATE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS jobs_changes_{event.lower()} AFTER {event} ON jobs
+            BEGIN
+                INSERT INTO calendar_changes (date_string) VALUES (NULL);
+            END
+        """)
+
+
+@migration
+def overtime_past_threshold(db_manager: "DatabaseManager") -> None:
+    """
+    Weekly overtime is the hours past 40. It used to be the hours modulo 40, which only held for
+    up to 79 hours of whole 12 hour shifts, so summaries are rebuilt with the new rule.
+    """
+    db_manager._rebuild_summaries()
+
+
+@migration
+def log_provisioned_years(db_manager: "DatabaseManager") -> None:
+    """
+    Provisioning logs one change per year itself, as a bare YYYY, instead of a per row insert
+    trigger that slowed bulk year inserts by more than half.
+    """
+    db_manager._cursor.execute("DROP TRIGGER IF EXISTS calendar_changes_insert")
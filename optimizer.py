@@ -0,0 +1,282 @@
+import math
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Optional
+
+from payroll import SHIFT_HOURS, overtime_hours, week_pay
+
+if TYPE_CHECKING:
+    from database_manager import DatabaseManager
+
+PayDays = dict[date, tuple[date, date]]
+
+
+@dataclass(frozen=True, slots=True)
+class Constraints:
+    """
+    Limits on the days a plan may work. max_shifts_per_week counts the 7 day weeks overtime is
+    paid on, from each pay period's start. max_consecutive also counts worked days stored just
+    before and after the planned days, and None leaves runs unlimited. max_shifts caps the whole
+    plan. Dates in days_off and days falling on weekdays_off, Monday as 0, are never worked.
+    """
+    max_shifts_per_week: int = 7
+    max_consecutive: Optional[int] = None
+    max_shifts: Optional[int] = None
+    days_off: frozenset[date] = frozenset()
+    weekdays_off: frozenset[int] = frozenset()
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.max_shifts_per_week <= 7:
+            raise ValueError("max_shifts_per_week must be from 0 to 7")
+        if self.max_consecutive is not None and self.max_consecutive < 1:
+            raise ValueError("max_consecutive must be at least 1")
+        if self.max_shifts is not None and self.max_shifts < 0:
+            raise ValueError("max_shifts can't be negative")
+
+    def allows(self, day: date) -> bool:
+        return day not in self.days_off and day.weekday() not in self.weekdays_off
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    """Days to work from start to end inclusive, with the gross pay of each pay period they cover."""
+    start: date
+    end: date
+    worked: tuple[date, ...]
+    gross_by_pay_day: dict[date, float]
+    overtime_hours: int
+
+    @property
+    def gross(self) -> float:
+        return sum(self.gross_by_pay_day.values())
+
+    @property
+    def shifts(self) -> int:
+        return len(self.worked)
+
+    @property
+    def hours(self) -> int:
+        return self.shifts * SHIFT_HOURS
+
+
+@dataclass(frozen=True, slots=True)
+class _Option:
+    """One way to work a week: a bitmask of its days, and the run of worked days it ends on."""
+    mask: int
+    shifts: int
+    run_out: int
+    pay: float
+
+
+def _week_options(
+        worths: tuple[float, ...],
+        allowed: int,
+        job: dict[str, Any],
+        max_shifts: int,
+        max_run: Optional[int]
+    ) -> list[list[_Option]]:
+    """
+    Every undominated way to work one week, for each run of worked days it can start after.
+    Options are kept only if no other pays as much with no more shifts and no longer closing
+    run, which leaves a handful of the up to 128 subsets of a week.
+    """
+    length = len(worths)
+    full = (1 << length) - 1
+    runs_in = range(max_run + 1) if max_run is not None else range(1)
+    best: list[dict[tuple[int, int], _Option]] = [{} for _ in runs_in]
+    mask = allowed
+    while True:
+        shifts = mask.bit_count()
+        if shifts <= max_shifts:
+            bits = [bool(mask >> offset & 1) for offset in range(length)]
+            pay = week_pay(shifts, sum(worth for worth, bit in zip(worths, bits) if bit), job)
+            leading = next((offset for offset, bit in enumerate(bits) if not bit), length)
+            trailing = next((offset for offset, bit in enumerate(reversed(bits)) if not bit), length)
+            longest = run = 0
+            for bit in bits:
+                run = run + 1 if bit else 0
+                longest = max(longest, run)
+            for run_in in runs_in:
+                if max_run is None:
+                    run_out = 0
+                elif mask == full:
+                    run_out = run_in + length
+                    if run_out > max_run:
+                        continue
+                else:
+                    if run_in + leading > max_run or longest > max_run:
+                        continue
+                    run_out = trailing
+                key = (shifts, run_out)
+                kept = best[run_in].get(key)
+                if kept is None or pay > kept.pay:
+                    best[run_in][key] = _Option(mask, shifts, run_out, pay)
+        if mask == 0:
+            break
+        mask = (mask - 1) & allowed
+
+    options = []
+    for by_key in best:
+        candidates = sorted(by_key.values(), key=lambda option: (option.shifts, option.run_out, -option.pay))
+        kept = []
+        for option in candidates:
+            if not any(
+                other.shifts <= option.shifts and other.run_out <= option.run_out and other.pay >= option.pay
+                for other in kept
+            ):
+                kept.append(option)
+        options.append(kept)
+    return options
+
+
+def _stored_run(days: dict[date, bool], first: date, step: int, limit: int) -> int:
+    """Worked days stored back to back from first, walking step days at a time, up to limit."""
+    run = 0
+    while run < limit and days.get(first + timedelta(days=step * run)):
+        run += 1
+    return run
+
+
+def optimize(
+        db_manager: "DatabaseManager",
+        pay_days: PayDays,
+        constraints: Constraints = Constraints(),
+        target: Optional[float] = None
+    ) -> Plan:
+    """
+    Chooses the days to work in the given pay periods, replacing the stored schedule there. With
+    a target, the plan grosses at least target on the fewest shifts, the best paid such plan if
+    several tie. Without one it grosses the most, on the fewest shifts among equals. Pay is
+    worked out as PayrollEngine does, per 7 day week of each period with overtime past 40 hours,
+    from each day's worth with its weekend, night and critical differentials.
+
+    Weeks are solved in order by dynamic programming over (run of worked days carried into the
+    week, shifts so far), keeping the best gross for each. Each week's choices are its
+    undominated subsets of days, enumerated once per distinct week, so a full year of biweekly
+    periods takes a fraction of a second. Raises ValueError if the target can't be met.
+    """
+    if not pay_days:
+        raise ValueError("No pay periods to plan")
+    job = db_manager.get_job(db_manager.DEFAULT_JOB_NAME)
+    if job is None:
+        raise ValueError(f"No job named {db_manager.DEFAULT_JOB_NAME!r} in {db_manager.db_path}")
+    periods = sorted(pay_days.items(), key=lambda item: item[1][0])
+    start = periods[0][1][0]
+    end = periods[-1][1][1]
+    max_run = constraints.max_consecutive
+    margin = timedelta(days=max_run + 1 if max_run else 0)
+    db_manager.insert_years(range((start - margin).year, (end + margin).year + 1))
+    rows = db_manager.get_days_range(str(start - margin), str(end + margin)) or []
+    worth_by_day = {date.fromisoformat(row["date_string"]): row["worth"] for row in rows}
+    stored = {date.fromisoformat(row["date_string"]): bool(row["is_working"]) for row in rows}
+
+    # (pay day, first day, length) of every overtime week, in date order.
+    weeks = []
+    for pay_day, (period_start, period_end) in periods:
+        week_start = period_start
+        while week_start <= period_end:
+            length = min(7, (period_end - week_start).days + 1)
+            weeks.append((pay_day, week_start, length))
+            week_start += timedelta(days=7)
+
+    option_cache: dict[tuple, list[list[_Option]]] = {}
+    week_options = []
+    for _, week_start, length in weeks:
+        days = [week_start + timedelta(days=offset) for offset in range(length)]
+        worths = tuple(worth_by_day.get(day, 0.0) for day in days)
+        allowed = sum(1 << offset for offset, day in enumerate(days) if day in worth_by_day and constraints.allows(day))
+        key = (worths, allowed)
+        if key not in option_cache:
+            option_cache[key] = _week_options(worths, allowed, job, constraints.max_shifts_per_week, max_run)
+        week_options.append(option_cache[key])
+
+    run_before = _stored_run(stored, start - timedelta(days=1), -1, max_run) if max_run else 0
+    run_after = _stored_run(stored, end + timedelta(days=1), 1, max_run + 1) if max_run else 0
+    runs = max_run + 1 if max_run else 1
+    most_shifts = sum(min(length, constraints.max_shifts_per_week) for _, _, length in weeks)
+    if constraints.max_shifts is not None:
+        most_shifts = min(most_shifts, constraints.max_shifts)
+
+    # gross[run][shifts] is the best gross so far ending on that run, -inf where unreachable.
+    # Each week's table is kept so the chosen days can be traced back afterwards.
+    gross = [[-math.inf] * (most_shifts + 1) for _ in range(runs)]
+    gross[run_before][0] = 0.0
+    tables = [gross]
+    reachable = 0
+    for options in week_options:
+        week_gross = [[-math.inf] * (most_shifts + 1) for _ in range(runs)]
+        for run_in, row in enumerate(gross):
+            for option in options[run_in]:
+                shifts = option.shifts
+                if shifts > most_shifts:
+                    continue
+                top = min(reachable, most_shifts - shifts) + 1
+                out = week_gross[option.run_out]
+                pay = option.pay
+                out[shifts:shifts + top] = [
+                    max(current, before + pay) for current, before in zip(out[shifts:shifts + top], row[:top])
+                ]
+        reachable = min(most_shifts, reachable + max((option.shifts for row in options for option in row), default=0))
+        gross = week_gross
+        tables.append(gross)
+
+    # Runs that would join the stored days after the plan into too long a run are ruled out.
+    finals = [
+        (total, shifts, run)
+        for run, row in enumerate(gross)
+        if not max_run or run == 0 or run + run_after <= max_run
+        for shifts, total in enumerate(row)
+        if total > -math.inf
+    ]
+    if target is None:
+        _, shifts, run = max(finals, key=lambda final: (final[0], -final[1]))
+    else:
+        meeting = [final for final in finals if final[0] >= target - 0.005]
+        if not meeting:
+            best = max((final[0] for final in finals), default=0.0)
+            raise ValueError(f"A gross of ${target:,.2f} can't be met, the most these limits allow is ${best:,.2f}")
+        _, shifts, run = min(meeting, key=lambda final: (final[1], -final[0]))
+
+    worked = []
+    gross_by_pay_day = {pay_day: 0.0 for pay_day, _ in periods}
+    overtime = 0
+    for index in range(len(weeks) - 1, -1, -1):
+        pay_day, week_start, length = weeks[index]
+        total = tables[index + 1][run][shifts]
+        before = tables[index]
+        option, run = next(
+            (option, run_in)
+            for run_in, options in enumerate(week_options[index])
+            for option in options
+            if option.run_out == run and option.shifts <= shifts
+            and before[run_in][shifts - option.shifts] + option.pay == total
+        )
+        shifts -= option.shifts
+        gross_by_pay_day[pay_day] += option.pay
+        overtime += overtime_hours(option.shifts)
+        worked.extend(week_start + timedelta(days=offset) for offset in range(length) if option.mask >> offset & 1)
+    return Plan(start, end, tuple(sorted(worked)), gross_by_pay_day, overtime)
+
+
+def plan_changes(db_manager: "DatabaseManager", plan: Plan) -> dict[str, bool]:
+    """The days whose stored is_working the plan changes, with their new value."""
+    worked = {str(day) for day in plan.worked}
+    return {
+        day["date_string"]: day["date_string"] in worked
+        for day in db_manager.get_days_range(str(plan.start), str(plan.end)) or []
+        if bool(day["is_working"]) != (day["date_string"] in worked)
+    }
+
+
+def apply_plan(db_manager: "DatabaseManager", plan: Plan) -> list[str]:
+    """
+    Writes a plan to is_working in one transaction, touching only the days it changes so other
+    instances reload no more than they must. Returns the changed dates. import_rows raises if the
+    write fails, leaving the calendar as it was.
+    """
+    changes = plan_changes(db_manager, plan)
+    if changes:
+        db_manager.import_rows(
+            "calendar", ({"date_string": date_string, "is_working": value} for date_string, value in changes.items())
+        )
+    return list(changes)
@@ -0,0 +1,106 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+CADENCE_DAYS = {
+    "weekly": 7,
+    "biweekly": 14,
+}
+CADENCES = ("weekly", "biweekly", "semimonthly", "monthly")
+
+
+@dataclass(frozen=True, slots=True)
+class PayPeriod:
+    pay_day: date
+    start: date
+    end: date
+
+
+class PayCalendar:
+    """
+    Generates pay periods for any year from an anchor payday and a cadence.
+
+    Weekly and biweekly periods repeat every 7 or 14 days from the anchor payday. Semimonthly
+    periods run from the 1st to the 15th and the 16th to month end, and monthly periods cover
+    the calendar month. In every cadence a period is paid lag_days after it ends. Each year is
+    generated once and indexed, so looking up the period for a date or the paydays in a month
+    is a dict lookup.
+    """
+
+    def __init__(self, anchor_pay_day: date, cadence: str = "biweekly", lag_days: int = 10) -> None:
+        if cadence not in CADENCES:
+            raise ValueError(f"Unknown pay cadence {cadence!r}, expected one of {CADENCES}")
+        self.anchor_pay_day = anchor_pay_day
+        self.cadence = cadence
+        self.lag_days = lag_days
+        self._periods_by_year: dict[int, tuple[PayPeriod, ...]] = {}
+        self._pay_days_by_month: dict[int, dict[int, dict[date, tuple[date, date]]]] = {}
+        self._period_index: dict[int, dict[date, PayPeriod]] = {}
+
+    def periods_for_year(self, year: int) -> tuple[PayPeriod, ...]:
+        """Every pay period whose payday falls in the given year, in order."""
+        periods = self._periods_by_year.get(year)
+        if periods is None:
+            periods = tuple(self._generate(year))
+            self._periods_by_year[year] = periods
+        return periods
+
+    def pay_days_in_month(self, year: int, month: int) -> dict[date, tuple[date, date]]:
+        """Maps each payday in the month to the (start, end) of the period it pays."""
+        by_month = self._pay_days_by_month.get(year)
+        if by_month is None:
+            by_month = {month_number: {} for month_number in range(1, 13)}
+            for period in self.periods_for_year(year):
+                by_month[period.pay_day.month][period.pay_day] = (period.start, period.end)
+            self._pay_days_by_month[year] = by_month
+        return by_month[month]
+
+    def period_for(self, day: date) -> Optional[PayPeriod]:
+        """The pay period that contains the given day."""
+        index = self._period_index.get(day.year)
+        if index is None:
+            index = {}
+            # Late December is often paid in January, so look one year ahead too.
+            for period in self.periods_for_year(day.year) + self.periods_for_year(day.year + 1):
+                current = max(period.start, date(day.year, 1, 1))
+                last = min(period.end, date(day.year, 12, 31))
+                while current <= last:
+                    index[current] = period
+                    current += timedelta(days=1)
+            self._period_index[day.year] = index
+        return index.get(day)
+
+    def _generate(self, year: int) -> list[PayPeriod]:
+        lag = timedelta(days=self.lag_days)
+        if self.cadence in CADENCE_DAYS:
+            step = CADENCE_DAYS[self.cadence]
+            # First payday on or after Jan 1st, counting whole cadences from the anchor.
+            offset = (date(year, 1, 1) - self.anchor_pay_day).days
+            pay_day = self.anchor_pay_day + timedelta(days=-(-offset // step) * step)
+            periods = []
+            while pay_day.year == year:
+                end = pay_day - lag
+                periods.append(PayPeriod(pay_day, end - timedelta(days=step - 1), end))
+                pay_day += timedelta(days=step)
+            return periods
+
+        # Calendar based cadences, generated from the year before so lagged paydays land in year.
+        periods = []
+        for period_year, month in ((year - 1, 12), *((year, month) for month in range(1, 13))):
+            month_end = date(period_year, month, calendar.monthrange(period_year, month)[1])
+            if self.cadence == "semimonthly":
+                bounds = [
+                    (date(period_year, month, 1), date(period_year, month, 15)),
+                    (date(period_year, month, 16), month_end),
+                ]
+            else:
+                bounds = [(date(period_year, month, 1), month_end)]
+            for start, end in bounds:
+                if (end + lag).year == year:
+                    periods.append(PayPeriod(end + lag, start, end))
+        return periods
+
+
+# Biweekly pay, ten days after each two week period ends.
+DEFAULT_PAY_CALENDAR = PayCalendar(anchor_pay_day=date(2025, 1, 14), cadence="biweekly", lag_days=10)
@@ -0,0 +1,163 @@
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Iterable, Mapping, Optional
+
+SHIFT_HOURS = 12
+OVERTIME_THRESHOLD_HOURS = 40
+
+PayDays = dict[date, tuple[date, date]]
+
+
+def weekly_overtime(hours_worked: float) -> float:
+    """Hours worked in a week past the overtime threshold. The pay summaries compute the same in SQL."""
+    return max(hours_worked - OVERTIME_THRESHOLD_HOURS, 0)
+
+
+def overtime_hours(days_worked: int) -> int:
+    """Overtime hours for a week with the given number of 12 hour shifts."""
+    return int(weekly_overtime(days_worked * SHIFT_HOURS))
+
+
+def week_pay(days_worked: int, worth: float, job: dict[str, Any]) -> float:
+    """Pay for a week given its shift count, the summed worth of those shifts, and the job rates."""
+    return week_pay_for_hours(days_worked * SHIFT_HOURS, worth, job)
+
+
+def week_pay_for_hours(hours_worked: float, worth: float, job: dict[str, Any]) -> float:
+    """Pay for a week given its hours, their summed straight-time worth, and the job rates."""
+    return worth + (job["overtime_rate"] - job["hourly_rate"]) * weekly_overtime(hours_worked)
+
+
+@dataclass
+class _Week:
+    """Running totals for one 7 day chunk of a pay period."""
+    hours: float = 0.0
+    worth: float = 0.0
+    pay: float = 0.0
+
+
+@dataclass
+class _PayPeriod:
+    weeks: list[tuple[str, str]] = field(default_factory=list)
+    pay: float = 0.0
+
+
+class PayrollEngine:
+    """
+    Keeps per-week and per-pay-period totals so that toggling one day updates only the week
+    and pay period containing it. Pay periods are split into 7 day weeks from their start date,
+    with overtime counted per week. Days are priced from the hours and worth of their stored
+    shifts when given, as the pay summaries are, so shifts of any length pay the same here.
+    """
+
+    def __init__(self, job: dict[str, Any]) -> None:
+        self.job = job
+        # (hours, worth, worth of a default shift) per day.
+        self._days: dict[str, tuple[float, float, float]] = {}
+        self._weeks: dict[tuple[str, str], _Week] = {}
+        self._weeks_by_day: dict[str, list[tuple[str, str]]] = {}
+        self._periods: dict[date, _PayPeriod] = {}
+        self._periods_by_week: dict[tuple[str, str], list[date]] = {}
+
+    def missing_periods(self, pay_days: PayDays) -> PayDays:
+        """Returns the pay periods that have not been added yet."""
+        return {
+            pay_day: start_end for pay_day, start_end in pay_days.items()
+            if pay_day not in self._periods
+        }
+
+    def add_periods(
+            self,
+            pay_days: PayDays,
+            days: Iterable[dict[str, Any]],
+            shifts: Optional[Mapping[str, tuple[float, float]]] = None
+        ) -> None:
+        """
+        Registers pay periods along with calendar rows covering them. shifts holds the (hours,
+        worth) of each day's stored shifts. Worked days without any, such as toggles not flushed
+        yet, count as one default shift, and without shifts every worked day does. Days already
+        known to the engine keep their current state.
+        """
+        shifts = shifts or {}
+        for day in days:
+            if day["date_string"] in self._days:
+                continue
+            if day["is_working"]:
+                hours, worth = shifts.get(day["date_string"], (SHIFT_HOURS, day["worth"]))
+            else:
+                hours, worth = 0.0, 0.0
+            self._days[day["date_string"]] = (hours, worth, day["worth"])
+
+        for pay_day, (start_date, end_date) in pay_days.items():
+            period = _PayPeriod()
+            week_start = start_date
+            while week_start <= end_date:
+                week_end = min(week_start + timedelta(days=6), end_date)
+                key = (str(week_start), str(week_end))
+                if key not in self._weeks:
+                    self._add_week(key, week_start, week_end)
+                period.weeks.append(key)
+                period.pay += self._weeks[key].pay
+                self._periods_by_week.setdefault(key, []).append(pay_day)
+                week_start += timedelta(days=7)
+            self._periods[pay_day] = period
+
+    def set_working(self, date_string: str, is_working: bool) -> None:
+        """
+        Records a toggle, updating only the weeks and pay periods that contain the day. A day
+        toggled on works one default shift, as update_day stores it.
+        """
+        if date_string not in self._days:
+            return
+        hours, worth, default_worth = self._days[date_string]
+        if (hours > 0) == is_working:
+            return
+        new_hours, new_worth = (SHIFT_HOURS, default_worth) if is_working else (0.0, 0.0)
+        self._days[date_string] = (new_hours, new_worth, default_worth)
+
+        for key in self._weeks_by_day.get(date_string, ()):
+            week = self._weeks[key]
+            week.hours += new_hours - hours
+            week.worth += new_worth - worth
+            old_pay = week.pay
+            week.pay = week_pay_for_hours(week.hours, week.worth, self.job)
+            for pay_day in self._periods_by_week[key]:
+                self._periods[pay_day].pay += week.pay - old_pay
+
+    def set_job(self, job: dict[str, Any]) -> None:
+        """
+        Swaps in new job rates and forgets every day, week and period, since each day's worth was
+        priced at the old rates. Callers re-add the periods they need with days read afresh, so
+        totals keep matching the pay summaries.
+        """
+        self.job = job
+        self._days.clear()
+        self._weeks.clear()
+        self._weeks_by_day.clear()
+        self._periods.clear()
+        self._periods_by_week.clear()
+
+    def period_pay(self, pay_day: date) -> float:
+        """Gross pay for a registered pay period."""
+        return self._periods[pay_day].pay
+
+    def month_totals(self, pay_days: PayDays) -> tuple[dict[str, float], float]:
+        """
+        Returns the gross pay for each payday in a month keyed by date string, and the monthly
+        total. Every pay period must already be registered.
+        """
+        biweekly_pay_days = {str(pay_day): self.period_pay(pay_day) for pay_day in pay_days}
+        return biweekly_pay_days, sum(biweekly_pay_days.values())
+
+    def _add_week(self, key: tuple[str, str], week_start: date, week_end: date) -> None:
+        week = _Week()
+        for offset in range((week_end - week_start).days + 1):
+            date_string = str(week_start + timedelta(days=offset))
+            if date_string not in self._days:
+                continue
+            hours, worth, _ = self._days[date_string]
+            week.hours += hours
+            week.worth += worth
+            self._weeks_by_day.setdefault(date_string, []).append(key)
+        week.pay = week_pay_for_hours(week.hours, week.worth, self.job)
+        self._weeks[key] = week
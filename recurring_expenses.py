@@ -0,0 +1,158 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Iterable, Iterator, Optional
+
+from calendar_cache import MonthKey
+
+# Checked in this order, so an expense with several flags set repeats at the first one.
+CADENCES = ("daily", "weekly", "biweekly", "monthly")
+CADENCE_DAYS = {
+    "daily": 1,
+    "weekly": 7,
+    "biweekly": 14,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Occurrence:
+    """One dated payment of an expense."""
+    date: date
+    expense_id: int
+    name: str
+    amount: float
+
+
+def cadence(expense: dict[str, Any]) -> Optional[str]:
+    """The cadence an expense row repeats at, or None for a one-off expense."""
+    for name in CADENCES:
+        if expense[name]:
+            return name
+    return None
+
+
+class ExpenseSchedule:
+    """
+    Expands expense rows into dated occurrences over any range.
+
+    Daily, weekly and biweekly expenses repeat every 1, 7 or 14 days from start_date. Monthly
+    expenses fall on their day of the month, moved back to the last day in shorter months. One-off
+    expenses fall on start_date. Nothing repeats after end_date, if set.
+
+    Each expense's occurrences are projected one month at a time and memoized per (expense, month)
+    until the expense is edited, and occurrences() walks the range month by month so only the
+    months being read are ever projected. Totals are counted without expanding occurrences at all.
+    """
+
+    def __init__(self, expenses: Iterable[dict[str, Any]] = ()) -> None:
+        self._expenses: dict[int, dict[str, Any]] = {}
+        self._months: dict[tuple[int, MonthKey], tuple[date, ...]] = {}
+        for expense in expenses:
+            self.put_expense(expense)
+
+    @property
+    def expenses(self) -> list[dict[str, Any]]:
+        return list(self._expenses.values())
+
+    def put_expense(self, expense: dict[str, Any]) -> None:
+        """Adds or replaces an expense row, dropping its memoized months."""
+        self._expenses[expense["id"]] = expense
+        self.invalidate(expense["id"])
+
+    def remove_expense(self, expense_id: int) -> None:
+        self._expenses.pop(expense_id, None)
+        self.invalidate(expense_id)
+
+    def invalidate(self, expense_id: int) -> None:
+        """Drops the memoized months of one expense."""
+        for key in [key for key in self._months if key[0] == expense_id]:
+            del self._months[key]
+
+    def month_dates(self, expense_id: int, year: int, month: int) -> tuple[date, ...]:
+        """Every date an expense falls on in a month, memoized until the expense changes."""
+        key = (expense_id, (year, month))
+        dates = self._months.get(key)
+        if dates is None:
+            dates = tuple(self._project_month(self._expenses[expense_id], year, month))
+            self._months[key] = dates
+        return dates
+
+    def occurrences(self, start: date, end: date) -> Iterator[Occurrence]:
+        """Lazily yields every occurrence between start and end inclusive, in date order."""
+        for year, month in self._months_between(start, end):
+            month_occurrences = [
+                Occurrence(day, expense_id, expense["name"], expense["amount"])
+                for expense_id, expense in self._expenses.items()
+                for day in self.month_dates(expense_id, year, month)
+                if start <= day <= end
+            ]
+            month_occurrences.sort(key=lambda occurrence: (occurrence.date, occurrence.expense_id))
+            yield from month_occurrences
+
+    def count(self, expense_id: int, start: date, end: date) -> int:
+        """How many times an expense falls between start and end inclusive."""
+        expense = self._expenses[expense_id]
+        first, last = self._active_range(expense, start, end)
+        if first > last:
+            return 0
+        repeats = cadence(expense)
+        anchor = date.fromisoformat(expense["start_date"])
+        if repeats is None:
+            return 1 if first <= anchor <= last else 0
+        if repeats in CADENCE_DAYS:
+            step = CADENCE_DAYS[repeats]
+            # First repeat on or after first, counting whole steps from the anchor.
+            next_day = anchor + timedelta(days=-(-(first - anchor).days // step) * step)
+            return (last - next_day).days // step + 1 if next_day <= last else 0
+        return sum(
+            first <= self._monthly_date(expense, year, month) <= last
+            for year, month in self._months_between(first, last)
+        )
+
+    def total_outflow(self, start: date, end: date) -> float:
+        """Sum of every occurrence between start and end inclusive, e.g. between two paydays."""
+        return sum(
+            expense["amount"] * self.count(expense_id, start, end)
+            for expense_id, expense in self._expenses.items()
+        )
+
+    def _project_month(self, expense: dict[str, Any], year: int, month: int) -> Iterator[date]:
+        month_start = date(year, month, 1)
+        month_end = date(year, month, calendar.monthrange(year, month)[1])
+        first, last = self._active_range(expense, month_start, month_end)
+        if first > last:
+            return
+        repeats = cadence(expense)
+        anchor = date.fromisoformat(expense["start_date"])
+        if repeats is None:
+            if first <= anchor <= last:
+                yield anchor
+        elif repeats in CADENCE_DAYS:
+            step = CADENCE_DAYS[repeats]
+            day = anchor + timedelta(days=-(-(first - anchor).days // step) * step)
+            while day <= last:
+                yield day
+                day += timedelta(days=step)
+        else:
+            day = self._monthly_date(expense, year, month)
+            if first <= day <= last:
+                yield day
+
+    @staticmethod
+    def _active_range(expense: dict[str, Any], start: date, end: date) -> tuple[date, date]:
+        """Clips start and end to the dates the expense is active."""
+        first = max(start, date.fromisoformat(expense["start_date"]))
+        last = min(end, date.fromisoformat(expense["end_date"])) if expense["end_date"] else end
+        return first, last
+
+    @staticmethod
+    def _monthly_date(expense: dict[str, Any], year: int, month: int) -> date:
+        day = expense["day"] or date.fromisoformat(expense["start_date"]).day
+        return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+    @staticmethod
+    def _months_between(start: date, end: date) -> Iterator[MonthKey]:
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            yield year, month
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
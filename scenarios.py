@@ -0,0 +1,262 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+from payroll import SHIFT_HOURS, overtime_hours, week_pay
+from pay_calendar import PayCalendar
+from withholding import DEFAULT_WITHHOLDING, PERIODS_PER_YEAR, WithholdingConfig, withholding_engine
+
+if TYPE_CHECKING:
+    from database_manager import DatabaseManager
+
+RANK_KEYS = ("net", "gross", "overtime_hours", "hours")
+RATE_COLUMNS = ("hourly_rate", "overtime_rate", "weekend_rate", "night_rate", "critical_rate")
+# Below this many scenarios a process pool costs more to start than it saves.
+MIN_PARALLEL_SCENARIOS = 64
+WEEKDAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Differential bits of ScheduleBase.flags, and the job rate each one adds.
+WEEKEND, NIGHT, CRITICAL = 1, 2, 4
+FLAG_RATES = ((WEEKEND, "weekend_rate"), (NIGHT, "night_rate"), (CRITICAL, "critical_rate"))
+# Extra shifts go on the first free days of each week in this order, weekdays before weekends.
+EXTRA_SHIFT_ORDER = (0, 1, 2, 3, 4, 5, 6)
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    """
+    Rules applied on top of the stored schedule for one year. Weekdays are numbered from Monday
+    as 0. drop_weekdays are never worked and add_weekdays always are, then extra_shifts_per_week
+    more shifts go on the first free days of each overtime week in extra_shift_order.
+    rate_multiplier scales every rate and rate_changes then set single job columns.
+    """
+    name: str
+    extra_shifts_per_week: int = 0
+    drop_weekdays: frozenset[int] = frozenset()
+    add_weekdays: frozenset[int] = frozenset()
+    extra_shift_order: tuple[int, ...] = EXTRA_SHIFT_ORDER
+    rate_multiplier: float = 1.0
+    rate_changes: tuple[tuple[str, float], ...] = ()
+
+    def __post_init__(self) -> None:
+        for column, _ in self.rate_changes:
+            if column not in RATE_COLUMNS:
+                raise ValueError(f"Unknown rate {column!r}, expected one of {RATE_COLUMNS}")
+
+    def job(self, job: dict[str, Any]) -> dict[str, Any]:
+        """The job rates this scenario pays."""
+        rates = {column: job[column] * self.rate_multiplier for column in RATE_COLUMNS}
+        rates.update(self.rate_changes)
+        return rates
+
+
+@dataclass(frozen=True, slots=True)
+class ScenarioResult:
+    """Annual totals of one scenario, over the pay periods paid in the year."""
+    name: str
+    gross: float
+    net: float
+    overtime_hours: float
+    hours: float
+    shifts: int
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleBase:
+    """
+    The stored schedule every scenario starts from, one entry per day from origin covering every
+    pay period paid in year: whether it is worked, and its differentials as WEEKEND | NIGHT |
+    CRITICAL bits. Also the job and the periods as (pay_day, start, end). Built once and sent
+    to each worker process once.
+    """
+    year: int
+    origin: date
+    working: tuple[bool, ...]
+    flags: tuple[int, ...]
+    job: dict[str, Any]
+    periods: tuple[tuple[date, date, date], ...]
+    periods_per_year: int
+    withholding: WithholdingConfig
+
+
+def load_base(
+        db_manager: "DatabaseManager",
+        year: int,
+        withholding: WithholdingConfig = DEFAULT_WITHHOLDING,
+        pay_calendar: Optional[PayCalendar] = None
+    ) -> ScheduleBase:
+    """Reads the days and job a year's scenarios start from, in one range query."""
+    pay_calendar = pay_calendar or db_manager.pay_calendar
+    periods = tuple((period.pay_day, period.start, period.end) for period in pay_calendar.periods_for_year(year))
+    if not periods:
+        raise ValueError(f"No paydays in {year}")
+    job = db_manager.get_job(db_manager.DEFAULT_JOB_NAME)
+    if job is None:
+        raise ValueError(f"No job named {db_manager.DEFAULT_JOB_NAME!r} in {db_manager.db_path}")
+    origin = periods[0][1]
+    last = periods[-1][2]
+    db_manager.insert_years(range(origin.year, last.year + 1))
+    days = {day["date_string"]: day for day in db_manager.get_days_range(str(origin), str(last)) or ()}
+    dates = [origin + timedelta(days=offset) for offset in range((last - origin).days + 1)]
+    rows = [days.get(str(day)) for day in dates]
+    return ScheduleBase(
+        year=year,
+        origin=origin,
+        working=tuple(bool(row and row["is_working"]) for row in rows),
+        flags=tuple(
+            (WEEKEND if day.weekday() >= 5 else 0)
+            | (NIGHT if row and row["is_night"] else 0)
+            | (CRITICAL if row and row["is_critical"] else 0)
+            for day, row in zip(dates, rows)
+        ),
+        job={column: job[column] for column in RATE_COLUMNS},
+        periods=periods,
+        periods_per_year=PERIODS_PER_YEAR[pay_calendar.cadence],
+        withholding=withholding,
+    )
+
+
+def evaluate(base: ScheduleBase, scenario: Scenario) -> ScenarioResult:
+    """
+    Applies a scenario to the base schedule and pays it as PayrollEngine does: each pay period
+    split into 7 day weeks from its start, overtime counted per week.
+    """
+    job = scenario.job(base.job)
+    day_count = len(base.working)
+    weekday_origin = base.origin.weekday()
+    working = list(base.working)
+    # Every seventh day shares a weekday, so whole weekdays are set with one slice each.
+    for weekday, value in (
+        *((weekday, True) for weekday in scenario.add_weekdays - scenario.drop_weekdays),
+        *((weekday, False) for weekday in scenario.drop_weekdays),
+    ):
+        first = (weekday - weekday_origin) % 7
+        working[first::7] = [value] * len(range(first, day_count, 7))
+
+    # Worth of a shift on each day, from the eight rate combinations its flags allow.
+    worth_by_flags = [
+        SHIFT_HOURS * (job["hourly_rate"] + sum(job[rate] for bit, rate in FLAG_RATES if flags & bit))
+        for flags in range(8)
+    ]
+    day_worth = [worth_by_flags[flags] for flags in base.flags]
+    # Day offsets within a week in the order extra shifts fill them, per first weekday.
+    fill_orders: dict[int, list[int]] = {}
+    allowed = [weekday for weekday in scenario.extra_shift_order if weekday not in scenario.drop_weekdays]
+
+    gross_by_pay_day = {}
+    total_overtime = 0
+    shifts = 0
+    for pay_day, start, end in base.periods:
+        period_gross = 0.0
+        week_start = (start - base.origin).days
+        period_end = (end - base.origin).days + 1
+        while week_start < period_end:
+            week_end = min(week_start + 7, period_end)
+            if scenario.extra_shifts_per_week:
+                first_weekday = (weekday_origin + week_start) % 7
+                order = fill_orders.get(first_weekday)
+                if order is None:
+                    order = fill_orders[first_weekday] = [(weekday - first_weekday) % 7 for weekday in allowed]
+                added = 0
+                for offset in order:
+                    index = week_start + offset
+                    if added == scenario.extra_shifts_per_week:
+                        break
+                    if index < week_end and not working[index]:
+                        working[index] = True
+                        added += 1
+            week = working[week_start:week_end]
+            days_worked = sum(week)
+            worth = sum(itertools.compress(day_worth[week_start:week_end], week))
+            period_gross += week_pay(days_worked, worth, job)
+            total_overtime += overtime_hours(days_worked)
+            shifts += days_worked
+            week_start = week_end
+        gross_by_pay_day[pay_day] = period_gross
+
+    # Paychecks in payday order, each withheld given the FICA wages paid before it.
+    engine = withholding_engine(base.withholding, base.periods_per_year)
+    gross = net = ytd_fica_wages = 0.0
+    for pay_day in sorted(gross_by_pay_day):
+        withholding = engine.withhold(gross_by_pay_day[pay_day], ytd_fica_wages)
+        ytd_fica_wages += engine.fica_wages(withholding.gross)
+        gross += withholding.gross
+        net += withholding.net
+    return ScenarioResult(
+        name=scenario.name,
+        gross=gross,
+        net=net,
+        overtime_hours=total_overtime,
+        hours=shifts * SHIFT_HOURS,
+        shifts=shifts,
+    )
+
+
+# The base of the scenarios a worker process evaluates, sent once by its initializer.
+_worker_base: Optional[ScheduleBase] = None
+
+
+def _init_worker(base: ScheduleBase) -> None:
+    global _worker_base
+    _worker_base = base
+
+
+def _evaluate_in_worker(scenario: Scenario) -> ScenarioResult:
+    return evaluate(_worker_base, scenario)
+
+
+def simulate(
+        base: ScheduleBase,
+        scenarios: Iterable[Scenario],
+        rank_by: str = "net",
+        workers: Optional[int] = None
+    ) -> list[ScenarioResult]:
+    """
+    Evaluates every scenario against base and returns the results best first by rank_by. Large
+    batches are spread over a process pool of workers, default one per core, with the base
+    sent to each worker once and scenarios handed out in chunks.
+    """
+    if rank_by not in RANK_KEYS:
+        raise ValueError(f"Unknown ranking {rank_by!r}, expected one of {RANK_KEYS}")
+    scenarios = list(scenarios)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(scenarios) < MIN_PARALLEL_SCENARIOS:
+        results = [evaluate(base, scenario) for scenario in scenarios]
+    else:
+        chunksize = max(1, math.ceil(len(scenarios) / (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(base,)) as executor:
+            results = list(executor.map(_evaluate_in_worker, scenarios, chunksize=chunksize))
+    return sorted(results, key=lambda result: getattr(result, rank_by), reverse=True)
+
+
+def scenario_grid(
+        extra_shifts_per_week: Iterable[int] = (0,),
+        drop_weekdays: Iterable[frozenset[int]] = (frozenset(),),
+        add_weekdays: Iterable[frozenset[int]] = (frozenset(),),
+        rate_multipliers: Iterable[float] = (1.0,)
+    ) -> list[Scenario]:
+    """Every combination of the given rules, each named after the rules it applies."""
+    scenarios = []
+    for extra, dropped, added, multiplier in itertools.product(
+        extra_shifts_per_week, drop_weekdays, add_weekdays, rate_multipliers
+    ):
+        parts = []
+        if extra:
+            parts.append(f"+{extra}/week")
+        if dropped:
+            parts.append("drop " + ",".join(WEEKDAY_NAMES[day] for day in sorted(dropped)))
+        if added:
+            parts.append("add " + ",".join(WEEKDAY_NAMES[day] for day in sorted(added)))
+        if multiplier != 1.0:
+            parts.append(f"rates x{multiplier:g}")
+        scenarios.append(Scenario(
+            name="; ".join(parts) or "current",
+            extra_shifts_per_week=extra,
+            drop_weekdays=frozenset(dropped),
+            add_weekdays=frozenset(added) - frozenset(dropped),
+            rate_multiplier=multiplier,
+        ))
+    return scenarios
@@ -3,11 +3,9 @@ from textual.screen import Screen
 
 class DatabaseScreen(Screen):
     """
-    Screen with access to a sqlite database via db_manager.
+    Screen with access to a sqlite database via db_manager, borrowed from the app's registry.
     """
 
-    db_manager: DatabaseManager
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.db_manager = DatabaseManager()
+    @property
+    def db_manager(self) -> DatabaseManager:
+        return self.app.databases.get()
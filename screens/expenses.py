@@ -1,9 +1,12 @@
+from datetime import date
 
+from textual import work
 from textual.app import ComposeResult
 from textual.containers import Container, Horizontal, Vertical, VerticalScroll
 from textual.reactive import Reactive, reactive
 from textual.widget import Widget
 from textual.widgets import (
+    DataTable,
     Footer,
     Header,
     Label,
@@ -12,14 +15,53 @@ from textual.widgets import (
     Switch
 )
 
+from async_database import AsyncDatabaseManager
+from recurring_expenses import cadence
+
 from .database import DatabaseManager, DatabaseScreen
 
+COLUMNS = ("Name", "Repeats", "Amount", "This month")
+
 
 class ExpenseView(Widget):
-    db_manager: DatabaseManager = DatabaseManager()
+
+    @property
+    def db_manager(self) -> DatabaseManager:
+        return self.app.databases.get()
+
+    @property
+    def async_db(self) -> AsyncDatabaseManager:
+        return self.app.databases.get_async()
 
     def compose(self) -> ComposeResult:
-        self.db_manager.create_expenses_table()
+        with Horizontal(id="expenses-totals"):
+            yield Label(id="expenses-month")
+            yield Label(id="expenses-month-total")
+        yield DataTable(id="expenses-table", zebra_stripes=True, cursor_type="row")
+
+    def on_mount(self) -> None:
+        self.query_one(DataTable).add_columns(*COLUMNS)
+        self.load_expenses()
+
+    @work(exclusive=True, group="expenses")
+    async def load_expenses(self) -> None:
+        """Lists every expense with what it costs over the current month."""
+        schedule = await self.async_db.get_expense_schedule()
+        today = date.today()
+        table = self.query_one(DataTable)
+        table.clear()
+        month_total = 0.0
+        for expense in schedule.expenses:
+            month_cost = expense["amount"] * len(schedule.month_dates(expense["id"], today.year, today.month))
+            month_total += month_cost
+            table.add_row(
+                expense["name"],
+                (cadence(expense) or "once").capitalize(),
+                f"${expense['amount']:.2f}",
+                f"${month_cost:.2f}",
+            )
+        self.query_one("#expenses-month", Label).update(f"{today:%B %Y}")
+        self.query_one("#expenses-month-total", Label).update(f"Outflow: ${month_total:.2f}")
 
 
 class ExpensesScreen(DatabaseScreen):
@@ -28,4 +70,4 @@ class ExpensesScreen(DatabaseScreen):
         yield Header(show_clock=True)
         with Container():
             yield ExpenseView()
-        yield Footer()
\ No newline at end of file
+        yield Footer()
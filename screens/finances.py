@@ -1,5 +1,64 @@
-from textual.screen import Screen
+from datetime import date, timedelta
 
+from textual import work
+from textual.app import ComposeResult
+from textual.containers import Container
+from textual.widget import Widget
+from textual.widgets import DataTable, Footer, Header, Label
 
-class FinancesScreen(Screen):
-    pass
+from async_database import AsyncDatabaseManager
+
+from .database import DatabaseManager, DatabaseScreen
+
+COLUMNS = ("Payday", "Until", "Payments", "Outflow")
+
+
+class FinancesView(Widget):
+    """Expense outflow between each payday this year and the next one."""
+
+    @property
+    def db_manager(self) -> DatabaseManager:
+        return self.app.databases.get()
+
+    @property
+    def async_db(self) -> AsyncDatabaseManager:
+        return self.app.databases.get_async()
+
+    def compose(self) -> ComposeResult:
+        yield Label(id="finances-title")
+        yield DataTable(id="finances-table", zebra_stripes=True, cursor_type="row")
+
+    def on_mount(self) -> None:
+        self.query_one(DataTable).add_columns(*COLUMNS)
+        self.load_outflow()
+
+    @work(exclusive=True, group="finances")
+    async def load_outflow(self) -> None:
+        schedule = await self.async_db.get_expense_schedule()
+        year = date.today().year
+        pay_calendar = self.db_manager.pay_calendar
+        pay_days = [period.pay_day for period in pay_calendar.periods_for_year(year) + pay_calendar.periods_for_year(year + 1)]
+
+        table = self.query_one(DataTable)
+        table.clear()
+        for pay_day, next_pay_day in zip(pay_days, pay_days[1:]):
+            if pay_day.year != year:
+                break
+            until = next_pay_day - timedelta(days=1)
+            payments = sum(1 for _ in schedule.occurrences(pay_day, until))
+            table.add_row(
+                f"{pay_day:%b %d}",
+                f"{until:%b %d}",
+                payments,
+                f"${schedule.total_outflow(pay_day, until):.2f}",
+            )
+        self.query_one("#finances-title", Label).update(f"Outflow between paydays, {year}")
+
+
+class FinancesScreen(DatabaseScreen):
+
+    def compose(self) -> ComposeResult:
+        yield Header(show_clock=True)
+        with Container():
+            yield FinancesView()
+        yield Footer()
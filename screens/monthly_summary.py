@@ -1,5 +1,99 @@
-from textual.screen import Screen
+import calendar
+from datetime import date
 
+from textual import work
+from textual.app import ComposeResult
+from textual.containers import Container, Horizontal
+from textual.widgets import DataTable, Footer, Header, Label
 
-class MonthlySummaryScreen(Screen):
-    pass
+from async_database import AsyncDatabaseManager
+from database_manager import HoursSummary
+from instrumentation import traced
+
+from .database import DatabaseScreen
+
+COLUMNS = ("Month", "Hours", "Regular", "Overtime", "Night", "Weekend", "Critical", "Gross")
+
+
+class MonthlySummaryScreen(DatabaseScreen):
+    """
+    Hours and gross pay per month, grouped by payday, for a span of years. Reads only the
+    maintained pay summaries, so drawing a year costs one query however many days were worked.
+    """
+
+    BINDINGS = [
+        ("left", "shift_years(-1)", "Earlier"),
+        ("right", "shift_years(1)", "Later"),
+    ]
+
+    def __init__(self, years_shown: int = 3, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.years_shown = years_shown
+        self.first_year = date.today().year - years_shown // 2
+
+    @property
+    def async_db(self) -> AsyncDatabaseManager:
+        return self.app.databases.get_async()
+
+    def compose(self) -> ComposeResult:
+        yield Header(show_clock=True)
+        with Container(id="summary-container"):
+            with Horizontal(id="summary-totals"):
+                yield Label(id="summary-span")
+                yield Label(id="summary-ytd")
+                yield Label(id="summary-gross")
+            yield DataTable(id="summary-table", zebra_stripes=True, cursor_type="row")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.query_one(DataTable).add_columns(*COLUMNS)
+
+    def on_screen_resume(self) -> None:
+        # Days may have been toggled on the work schedule since this screen was last shown.
+        self.load_summaries()
+
+    def action_shift_years(self, step: int) -> None:
+        self.first_year += step
+        self.load_summaries()
+
+    @work(exclusive=True, group="summary")
+    @traced
+    async def load_summaries(self) -> None:
+        """Flushes queued day changes so the summaries include them, then redraws the table."""
+        try:
+            await self.async_db.flush()
+        except Exception as error:
+            # Reads still see the queued changes, and the next flush tries them again.
+            self.notify(f"Changes not saved yet: {error}", severity="error")
+        years = range(self.first_year, self.first_year + self.years_shown)
+        months = await self.async_db.get_summaries("month", years)
+        totals = await self.async_db.get_summaries("year", years)
+
+        table = self.query_one(DataTable)
+        table.clear()
+        for year in years:
+            for month in range(1, 13):
+                table.add_row(calendar.month_name[month], *self.format_summary(months.get(f"{year}-{month:02}")))
+            table.add_row(f"[b]{year}[/b]", *self.format_summary(totals.get(str(year))))
+
+        self.query_one("#summary-span", Label).update(f"{years[0]} - {years[-1]}")
+        earnings = await self.async_db.get_earnings_index()
+        if earnings is not None:
+            hours, worth = earnings.year_to_date(date.today())
+            self.query_one("#summary-ytd", Label).update(f"YTD: {hours:g}h, ${round(worth)} before overtime")
+        self.query_one("#summary-gross", Label).update(
+            f"Gross: ${round(sum(summary.gross for summary in totals.values()))}"
+        )
+
+    @staticmethod
+    def format_summary(summary: HoursSummary | None) -> tuple[str, ...]:
+        summary = summary or HoursSummary()
+        hours = (
+            summary.hours,
+            summary.regular_hours,
+            summary.overtime_hours,
+            summary.night_hours,
+            summary.weekend_hours,
+            summary.critical_hours,
+        )
+        return (*(f"{value:g}" for value in hours), f"${round(summary.gross)}")
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from textual.app import ComposeResult
+from textual.containers import Container
+from textual.screen import ModalScreen
+from textual.widgets import DataTable, Footer, Label
+
+from instrumentation import stats
+
+COLUMNS = ("Call site", "Calls", "SQL", "Mean ms", "p50 ms", "p95 ms", "Max ms")
+
+
+class StatsScreen(ModalScreen):
+    """
+    Debug overlay listing SQL statement counts and latencies by call site.
+    """
+
+    BINDINGS = [
+        ("t", "app.pop_screen", "Close"),
+        ("s", "dump_stats", "Dump to file"),
+        ("r", "reset_stats", "Reset"),
+    ]
+
+    def compose(self) -> ComposeResult:
+        with Container(id="stats-dialog"):
+            yield Label(id="stats-total")
+            yield DataTable(id="stats-table", zebra_stripes=True, cursor_type="row")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.query_one(DataTable).add_columns(*COLUMNS)
+        self.refresh_stats()
+        self.set_interval(1.0, self.refresh_stats)
+
+    def refresh_stats(self) -> None:
+        """Redraws the table from a fresh snapshot."""
+        snapshot = stats.snapshot()
+        self.query_one("#stats-total", Label).update(
+            f"SQL statements: {snapshot['statements_total']}"
+        )
+        table = self.query_one(DataTable)
+        table.clear()
+        for site, site_stats in snapshot["sites"].items():
+            table.add_row(
+                site,
+                site_stats["count"],
+                site_stats["statements"],
+                f"{site_stats['mean_ms']:.3f}",
+                f"{site_stats['p50_ms']:.3f}",
+                f"{site_stats['p95_ms']:.3f}",
+                f"{site_stats['max_ms']:.3f}",
+            )
+
+    def action_dump_stats(self) -> None:
+        path = f"timewizard-stats-{datetime.now():%Y%m%d-%H%M%S}.json"
+        stats.dump(path)
+        self.notify(f"Stats written to {path}")
+
+    def action_reset_stats(self) -> None:
+        stats.reset()
+        self.refresh_stats()
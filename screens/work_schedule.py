@@ -2,96 +2,66 @@ import calendar
 import itertools
 
 from calendar import Calendar
-from datetime import date, datetime, timedelta
-from textual import log
+from datetime import date, datetime
+from textual import log, work
 from textual.app import ComposeResult
 from textual.containers import Container, Horizontal, VerticalScroll
 from textual.reactive import Reactive, reactive
 from textual.widget import Widget
 from textual.widgets import (
-    Button,
     Footer,
     Header,
     Label,
-    Rule,
     Select,
     Switch
 )
 
+from async_database import AsyncDatabaseManager
+from database_manager import CalendarChanges
+from day_store import Day
+from instrumentation import traced
+from payroll import PayrollEngine
+from withholding import PERIODS_PER_YEAR, PayLedger, Withholding, withholding_engine
+
 from .database import DatabaseManager, DatabaseScreen
 
-PAY_DAYS_BY_MONTH = {
-    1: {
-        date(2025, 1, 14): (date(2024, 12, 22), date(2025, 1, 4)),
-        date(2025, 1, 28): (date(2025, 1, 5), date(2025, 1, 18))
-    },
-    2: {
-        date(2025, 2, 11): (date(2025, 1, 19), date(2025, 2, 1)),
-        date(2025, 2, 25): (date(2025, 2, 2), date(2025, 2, 15))
-    },
-    3: {
-        date(2025, 3, 11): (date(2025, 2, 16), date(2025, 3, 1)),
-        date(2025, 3, 25): (date(2025, 3, 2), date(2025, 3, 15))
-    },
-    4: {
-        date(2025, 4, 8): (date(2025, 3, 16), date(2025, 3, 29)),
-        date(2025, 4, 22): (date(2025, 3, 30), date(2025, 4, 12))
-    },
-    5: {
-        date(2025, 5, 6): (date(2025, 4, 13), date(2025, 4, 26)),
-        date(2025, 5, 20): (date(2025, 4, 27), date(2025, 5, 10))
-    },
-    6: {
-        date(2025, 6, 3): (date(2025, 5, 11), date(2025, 5, 24)),
-        date(2025, 6, 17): (date(2025, 5, 25), date(2025, 6, 7))
-    },
-    7: {
-        date(2025, 7, 1): (date(2025, 6, 8), date(2025, 6, 21)),
-        date(2025, 7, 15): (date(2025, 6, 22), date(2025, 7, 5)),
-        date(2025, 7, 29): (date(2025, 7, 6), date(2025, 7, 19))
-    },
-    8: {
-        date(2025, 8, 12): (date(2025, 7, 20), date(2025, 8, 2)),
-        date(2025, 8, 26): (date(2025, 8, 3), date(2025, 8, 16))
-    },
-    9: {
-        date(2025, 9, 9): (date(2025, 8, 17), date(2025, 8, 30)),
-        date(2025, 9, 23): (date(2025, 8, 31), date(2025, 9, 13))
-    },
-    10: {
-        date(2025, 10, 7): (date(2025, 9, 14), date(2025, 9, 27)),
-        date(2025, 10, 21): (date(2025, 9, 28), date(2025, 10, 11))
-    },
-    11: {
-        date(2025, 11, 4): (date(2025, 10, 12), date(2025, 10, 25)),
-        date(2025, 11, 18): (date(2025, 10, 26), date(2025, 11, 8))
-    },
-    12: {
-        date(2025, 12, 2): (date(2025, 11, 9), date(2025, 11, 22)),
-        date(2025, 12, 16): (date(2025, 11, 23), date(2025, 12, 6)),
-        date(2025, 12, 30): (date(2025, 12, 7), date(2025, 12, 20))
-    },
-}
+CALENDAR_WEEKS = 6
+MAX_PAY_DAYS_PER_MONTH = 5
 
 
 class CalendarView(Widget):
 
-    db_manager: DatabaseManager = DatabaseManager()
-    days: Reactive[list[dict[str, str | int | bool]]] = reactive([], recompose=True)
-    biweekly_pay_days: Reactive[dict[str, int]] = reactive({})
-    monthly_pay: Reactive[int] = reactive(0)
-    job: dict = {}
-    today: datetime = datetime.today().date()
-    selected_month: str = calendar.month_name[today.month]
-    selected_month_int: int = today.month
-    selected_year: int = today.year
+    days: Reactive[list[Day]] = reactive(list)
+    biweekly_pay_days: Reactive[dict[str, Withholding]] = reactive(dict)
+    monthly_pay: Reactive[float] = reactive(0)
+    monthly_net: Reactive[float] = reactive(0)
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.job: dict = {}
+        self.payroll: PayrollEngine | None = None
+        # Gross and withholding for every payday of a year, keyed by the payday's year.
+        self.ledgers: dict[int, PayLedger] = {}
+        self.ledgers_stale = False
+        self.today: date = datetime.today().date()
+        self.selected_month: str = calendar.month_name[self.today.month]
+        self.selected_month_int: int = self.today.month
+        self.selected_year: int = self.today.year
+        # Day cells of the fixed grid, collected once on mount.
+        self._weeks: list[Container] = []
+        self._cells: list[Container] = []
+        self._switches: list[Switch] = []
+        self._cells_by_date: dict[str, Container] = {}
 
-    primary_color: str
-    primary_color_muted: str
-    secondary_color: str
-    secondary_color_muted: str
+    @property
+    def db_manager(self) -> DatabaseManager:
+        return self.app.databases.get()
 
+    @property
+    def async_db(self) -> AsyncDatabaseManager:
+        return self.app.databases.get_async()
 
+    @traced
     def compose(self) -> ComposeResult:
         with VerticalScroll(id="calendar-window"):
             with Container(id="calendar-container"):
@@ -106,66 +76,94 @@ class CalendarView(Widget):
                     yield Label("Thurs", classes="title")
                     yield Label("Fri", classes="title")
                     yield Label("Sat", classes="title")
-                list_of_weeks = itertools.batched(self.days, 7)
-                for week in list_of_weeks:
+                # A fixed grid of day cells, filled in place by watch_days as months change.
+                for week_index in range(CALENDAR_WEEKS):
                     with Container(classes="calendar-weeks"):
-                        for day in week:
-                            day_container = Container(classes="day-container", id=f"container-{day['date_string']}")
-                            day_container.border_title = str(day["day"])
-                            day_container.styles.border = ("round", self.app.get_css_variables().get("primary")) if day["date_string"] == str(self.today) else ("round", self.app.get_css_variables().get("secondary-muted"))
-                            day_container.border_subtitle = f"${round(day["worth"])}"
-                            with day_container:
-                                yield Switch(
-                                    value=day["is_working"],
-                                    name=f"{day["date_string"]}",
-                                    classes=f"{"switch-on" if day ["is_working"] else ""}"
-                                    
-                                )
+                        for weekday_index in range(7):
+                            with Container(classes="day-container", id=f"cell-{week_index * 7 + weekday_index}"):
+                                yield Switch()
                 with Horizontal(id="quick-pay-summary"):
-                    for date, amount in self.biweekly_pay_days.items():
-                        with Container(classes="pay-week"):
-                            label = Label(
-                                f"Pay {date[5:]}",
-                                id=f"payday-{date}"
-                            )
-                            label.styles.background = self.app.get_css_variables().get("secondary-muted")
-                            yield label
-                            yield Label(
-                                f"Net: ${round(amount)}",
-                                id=f"pay-{date}")
-                            yield Label(
-                                f"Taxed: ${round(amount - (amount * .31))}",
-                                id=f"taxed-{date}"
-                            )
+                    for index in range(MAX_PAY_DAYS_PER_MONTH):
+                        with Container(classes="pay-week", id=f"pay-week-{index}"):
+                            yield Label(id=f"payday-{index}", classes="pay-title")
+                            yield Label(id=f"pay-{index}")
+                            yield Label(id=f"taxed-{index}")
                     with Container(classes="pay-week"):
-                        label = Label("Total")
-                        label.styles.background = self.app.get_css_variables().get("secondary-muted")
-                        yield label
+                        yield Label("Total", classes="pay-title")
                         yield Label(
                             f"Month: ${round(self.monthly_pay)}",
                             id="monthly-pay"
                         )
                         yield Label(
-                            f"Taxed: ${round(self.monthly_pay - (self.monthly_pay * .31))}",
+                            f"Net: ${round(self.monthly_net)}",
                             id="monthly-pay-taxed"
                         )
 
     def on_mount(self) -> None:
         """Runs list of functions when mounting the widget."""
-        self.primary_color = self.app.get_css_variables().get("primary")
-        self.primary_color_muted = self.app.get_css_variables().get("primary-muted")
-        self.secondary_color = self.app.get_css_variables().get("secondary")
-        self.secondary_color_muted = self.app.get_css_variables().get("secondary-muted")
+        self._weeks = list(self.query(".calendar-weeks"))
+        self._cells = list(self.query(".day-container"))
+        self._switches = [cell.query_one(Switch) for cell in self._cells]
 
+        self.app.calendar_changed_signal.subscribe(self, self.on_calendar_changed)
+        self.load_calendar()
+
+    def on_calendar_changed(self, change: tuple[str, CalendarChanges]) -> None:
+        """
+        Another instance changed the db. The manager has already dropped the changed months from
+        its cache, so reload only if one of them is on screen or paid this month.
+        """
+        db_path, changes = change
+        if db_path != self.db_manager.db_path or not self.days:
+            return
+        # Payroll totals may include the old rows, so rebuild them with the job on the next load.
+        self.job = {}
+        shown = {(day["year"], day["month"]) for day in self.days}
+        for start, end in self.db_manager.pay_calendar.pay_days_in_month(self.selected_year, self.selected_month_int).values():
+            shown.update({(start.year, start.month), (end.year, end.month)})
+        if changes.everything or changes.months & shown:
+            self.reload_month()
+
+    @work(group="provision")
+    async def load_calendar(self) -> None:
+        """Prebuilds the surrounding years off the event loop, then loads the selected month."""
         # Ensure current year, previous year, and next year's calendar is prebuilt into database.
         current_year = datetime.now().year
-        for increment in (-1, 0, 1):
-            if not self.db_manager.year_exists(current_year + increment):
-                self.db_manager.insert_year(current_year + increment)
+        report = await self.async_db.insert_years(range(current_year - 1, current_year + 2))
+        if report and report.years_inserted:
+            log(f"Provisioned {report.years_inserted} in {report.elapsed_ms:.2f}ms")
 
-        self.refresh_calendar()
-        self.job = self.db_manager.get_job("unc_nursing") # Job data for pay rates
-        self.calculate_pay_day_pay()
+        self.reload_month()
+
+    @work(exclusive=True, group="calendar")
+    @traced
+    async def reload_month(self) -> None:
+        """Loads the selected month, superseding any month load still in progress."""
+        try:
+            await self.async_db.flush()
+        except Exception as error:
+            # Reads still see the queued changes, and the next flush tries them again.
+            self.notify(f"Changes not saved yet: {error}", severity="error")
+        if not self.job:
+            job_name = self.db_manager.DEFAULT_JOB_NAME
+            job = await self.async_db.get_job(job_name) # Job data for pay rates
+            if job is None:
+                # A fresh db has no job yet, so show the days without pay rather than fail.
+                self.payroll = None
+                self.notify(f"No job named {job_name!r}, so pay can't be worked out", severity="error")
+            else:
+                self.job = job
+                self.payroll = PayrollEngine(self.job)
+            self.ledgers = {}
+        if self.ledgers_stale:
+            # Toggles may have changed periods paid outside the month shown, so re-read the
+            # year's paychecks from the pay summaries now that they are flushed.
+            self.ledgers = {}
+            self.ledgers_stale = False
+        await self.refresh_calendar()
+        self.refresh_pay_subtitle()
+        if self.payroll is not None:
+            await self.calculate_pay_day_pay()
 
     def on_select_changed(self, event: Select.Changed) -> None:
         """fires when any select menu is set."""
@@ -175,39 +173,67 @@ class CalendarView(Widget):
         if event.select.id == "select-year":
             self.selected_year = event.select.value
 
-        self.refresh_calendar()
-        self.refresh_pay_subtitle()
-        self.calculate_pay_day_pay()
+        self.reload_month()
 
-    def on_switch_changed(self, event: Switch.Changed) -> None:
+    @traced
+    async def on_switch_changed(self, event: Switch.Changed) -> None:
         """Fires when any switch is actuated."""
         if event.value:
             event.switch.add_class("switch-on")
         else:
             event.switch.remove_class("switch-on")
 
-        date_string = event.switch.name
+        # Switches are reused across months, so the grid position identifies the day.
+        date_string = self.days[self._switches.index(event.switch)]["date_string"]
         column = "is_working"
         new_value = event.switch.value
         # Update is_working column in the db
-        self.db_manager.update_day(date_string, column, new_value)
+        await self.async_db.update_day(date_string, column, new_value)
         for day in self.days:
             if day["date_string"] == date_string:
                 day["is_working"] = new_value
 
         self.refresh_pay_subtitle()
-        self.calculate_pay_day_pay()
+        self.ledgers_stale = True
+        if self.payroll is not None:
+            self.payroll.set_working(date_string, new_value)
+            self.update_pay_totals()
+
+    @traced
+    def watch_days(self) -> None:
+        """Fires when days are newly set. Updates the existing day cells in place."""
+        week_count = len(self.days) // 7
+        for week_index, week in enumerate(self._weeks):
+            week.display = week_index < week_count
+
+        self._cells_by_date = {}
+        today = str(self.today)
+        # Setting switch values here is not a user toggle, so keep it from writing to the db.
+        with self.prevent(Switch.Changed):
+            for day, cell, switch in zip(self.days, self._cells, self._switches):
+                cell.border_title = str(day["day"])
+                cell.border_subtitle = f"${round(day["worth"])}"
+                cell.set_class(day["date_string"] == today, "today")
+                switch.value = bool(day["is_working"])
+                switch.set_class(bool(day["is_working"]), "switch-on")
+                self._cells_by_date[day["date_string"]] = cell
 
     def watch_biweekly_pay_days(self) -> None:
         """Fires when biweekly pay gets newly set."""
-        for week_str, amount in self.biweekly_pay_days.items():
+        pay_days = list(self.biweekly_pay_days.items())
+        for index in range(MAX_PAY_DAYS_PER_MONTH):
             try:
-                label = self.query_one(f"#payday-{week_str}", Label)
+                container = self.query_one(f"#pay-week-{index}", Container)
+                container.display = index < len(pay_days)
+                if index >= len(pay_days):
+                    continue
+                week_str, withholding = pay_days[index]
+                label = self.query_one(f"#payday-{index}", Label)
                 label.update(f"Pay {week_str[5:]}")
-                label = self.query_one(f"#pay-{week_str}", Label)
-                label.update(f"Net: ${round(amount)}")
-                label = self.query_one(f"#taxed-{week_str}", Label)
-                label.update(f"Actual: ${round(amount - (amount * .24))}")
+                label = self.query_one(f"#pay-{index}", Label)
+                label.update(f"Gross: ${round(withholding.gross)}")
+                label = self.query_one(f"#taxed-{index}", Label)
+                label.update(f"Net: ${round(withholding.net)}")
             except Exception:
                 # This can happen if the widget hasn't been mounted yet, so we can safely ignore it.
                 pass
@@ -217,63 +243,70 @@ class CalendarView(Widget):
         try:
             label = self.query_one("#monthly-pay", Label)
             label.update(f"Month: ${round(self.monthly_pay)}")
+        except Exception:
+            # This can happen if the widget hasn't been mounted yet, so we can safely ignore it.
+            pass
+
+    def watch_monthly_net(self) -> None:
+        """Fires when monthly take-home pay gets newly set."""
+        try:
             label = self.query_one("#monthly-pay-taxed", Label)
-            label.update(f"Taxed: ${round(self.monthly_pay - (self.monthly_pay * .24))}")
+            label.update(f"Net: ${round(self.monthly_net)}")
         except Exception:
             # This can happen if the widget hasn't been mounted yet, so we can safely ignore it.
             pass
                     
-    def calculate_pay_day_pay(self) -> None:
+    @traced
+    async def calculate_pay_day_pay(self) -> None:
+        """
+        Calculates the total earnings per pay period including OT, as well as monthly totals, and
+        the withholding on each paycheck given the paychecks earlier in the year.
         """
-        Calculates the total earnings per pay period including OT, as well as monthly totals. Also accounts
-        for taxes. Can tweak the biweekly pay with percentages to track ADP more closely.
+        pay_days = self.db_manager.pay_calendar.pay_days_in_month(self.selected_year, self.selected_month_int)
+
+        # Register any pay periods the payroll engine hasn't seen, fetching their days and the
+        # hours of their shifts in one query each.
+        missing = self.payroll.missing_periods(pay_days)
+        if missing:
+            first_day = min(start for start, _ in missing.values())
+            last_day = max(end for _, end in missing.values())
+            days_in_range = await self.async_db.get_days_range(str(first_day), str(last_day))
+            shifts = await self.async_db.get_shift_totals(str(first_day), str(last_day))
+            self.payroll.add_periods(missing, days_in_range, shifts)
+
+        # Year to date withholding needs every earlier paycheck, read once per year from the
+        # pay summaries.
+        pay_calendar = self.db_manager.pay_calendar
+        for year in {pay_day.year for pay_day in pay_days} - self.ledgers.keys():
+            summaries = await self.async_db.get_summaries("period", [year])
+            self.ledgers[year] = PayLedger.from_summaries(
+                withholding_engine(self.app.withholding, PERIODS_PER_YEAR[pay_calendar.cadence]),
+                [period.pay_day for period in pay_calendar.periods_for_year(year)],
+                summaries or {},
+            )
+
+        self.update_pay_totals()
+
+    def update_pay_totals(self) -> None:
+        """
+        Reads the selected month's pay from the payroll engine into the year's ledger, which only
+        recomputes withholding for the paydays whose pay changed.
         """
-        biweekly_pay_days = {}
-        total_monthly_pay = 0
-        pay_days = PAY_DAYS_BY_MONTH[self.selected_month_int]
-        pay_day_ranges: dict[str, list[dict[str, str | int | bool]]] = {}
-
-        # For each payday in a month, build a list of days to retrieve under that payday
-        for pay_day_datetime, pay_day_start_end in pay_days.items():
-            date_list = []
-            start_date = pay_day_start_end[0]
-            end_date = pay_day_start_end[1]
-            current_date = start_date
-            while current_date <= end_date:
-                date_list.append(str(current_date))
-                current_date += timedelta(days=1)
-            pay_day_ranges[str(pay_day_datetime)] = self.db_manager.get_days(date_list)
-        
-        # For each pay day, calc the biweekly amount including overtime
-        for pay_day, list_of_days in pay_day_ranges.items():
-            biweekly_pay = 0
-            list_of_weeks = [list_of_days[0:7], list_of_days[7:14]]
-
-            for week in list_of_weeks:
-                days_working = [day for day in week if day["is_working"]]
-                total_weekly_pay = 0
-                total_hours_worked = len(days_working) * 12
-                
-                # Add up our base amounts.
-                for day in days_working:
-                    total_weekly_pay += day["worth"]
-
-                # Add in overtime.
-                if total_hours_worked >= 40:
-                    overtime_hours = total_hours_worked % 40
-                    total_weekly_pay += ((self.job["overtime_rate"] - self.job["hourly_rate"]) * overtime_hours)
-                
-                # Add week to biweekly total.
-                biweekly_pay += total_weekly_pay
-            
-            # Add biweekly data back to our instance var.
-            biweekly_pay_days[pay_day] = biweekly_pay + (biweekly_pay * 0.06) # To correct by 6-8% observed error
-            total_monthly_pay += biweekly_pay
-
-        self.biweekly_pay_days = biweekly_pay_days
-        self.monthly_pay = total_monthly_pay
-
-    def refresh_calendar(self) -> None:
+        pay_days = self.db_manager.pay_calendar.pay_days_in_month(self.selected_year, self.selected_month_int)
+        if any(pay_day.year not in self.ledgers for pay_day in pay_days):
+            return
+        withholdings = {}
+        for pay_day in pay_days:
+            ledger = self.ledgers[pay_day.year]
+            ledger.set_gross(pay_day, self.payroll.period_pay(pay_day))
+            withholdings[str(pay_day)] = ledger.withholding(pay_day)
+        month = sum(withholdings.values(), Withholding())
+        self.biweekly_pay_days = withholdings
+        self.monthly_pay = month.gross
+        self.monthly_net = month.net
+
+    @traced
+    async def refresh_calendar(self) -> None:
         """
         Rebuilds each month based on selected_year and selected_month_int by pulling the days from the
         database and setting them to self.days.
@@ -283,12 +316,11 @@ class CalendarView(Widget):
         calendar_week_list = calendar_week_list.monthdatescalendar(
             self.selected_year, self.selected_month_int
         )
-        calendar_days_list = []
-        for week in calendar_week_list:
-            for day in week:
-                calendar_days_list.append(str(day))
-        self.days = self.db_manager.get_days(calendar_days_list)    
+        first_day = calendar_week_list[0][0]
+        last_day = calendar_week_list[-1][-1]
+        self.days = await self.async_db.get_days_range(str(first_day), str(last_day))
 
+    @traced
     def refresh_pay_subtitle(self) -> None:
         """Update subtitle pay values if week is overtime week."""
         list_of_weeks = itertools.batched(self.days, 7)
@@ -306,14 +338,14 @@ class CalendarView(Widget):
                         for index, day in enumerate(overtime_potential_days, start=1):
                             # First day is 4 hours of regular and 8 hours ot.
                             if index == 1:
-                                container = self.query_one(f"#container-{day["date_string"]}")
+                                container = self._cells_by_date[day["date_string"]]
                                 container.border_subtitle = f"${round(
                                     day["worth"]
                                     + ((self.job["overtime_rate"] - self.job["hourly_rate"]) * 8)
                                 )}"
                             # Days past the first day are full 12 hours ot.
                             else:
-                                container = self.query_one(f"#container-{day["date_string"]}")
+                                container = self._cells_by_date[day["date_string"]]
                                 container.border_subtitle = f"${round(
                                     day["worth"]
                                     + ((self.job["overtime_rate"] - self.job["hourly_rate"]) * 12)
@@ -325,7 +357,7 @@ class CalendarView(Widget):
                 try:
                     # Reset pay values for entire week to clear previous changes
                     for day in week:
-                        container = self.query_one(f"#container-{day["date_string"]}")
+                        container = self._cells_by_date[day["date_string"]]
                         container.border_subtitle = f"${round(day["worth"])}"
                 except Exception:
                     # Between unmounts, can't find node so let it pass
@@ -1,18 +1,37 @@
+import importlib
+import os
+from typing import Callable, Optional
+
 from textual import log
 from textual.app import App, ComposeResult
 from textual.containers import Grid
 from textual.screen import ModalScreen, Screen
+from textual.signal import Signal
 from textual.widgets import (
     Button,
     Footer,
     Header,
     Label,
 )
-from screens.finances import FinancesScreen
-from screens.expenses import ExpensesScreen
-from screens.monthly_summary import MonthlySummaryScreen
-from screens.projects import ProjectsScreen
-from screens.work_schedule import WorkScheduleScreen
+from connection_profile import PROFILES
+from database_manager import CalendarChanges, DatabaseRegistry
+from withholding import DEFAULT_WITHHOLDING, WithholdingConfig
+
+# How often queued calendar writes are flushed to disk.
+FLUSH_INTERVAL_SECONDS = 5.0
+# How often open dbs are checked for commits from other instances.
+CHANGE_POLL_INTERVAL_SECONDS = 1.0
+
+
+def lazy_screen(module_name: str, class_name: str) -> Callable[[], Screen]:
+    """
+    Returns a screen factory for MODES that imports the screen's module the first time the
+    mode is entered, keeping screen imports off the startup path.
+    """
+    def build_screen() -> Screen:
+        return getattr(importlib.import_module(module_name), class_name)()
+    return build_screen
+
 
 class QuitScreen(ModalScreen):
     """Screen with a dialog to quit."""
@@ -46,22 +65,45 @@ class TimeWizardApp(App):
         ("e", "switch_mode('expenses')", "Expenses"),
         ("p", "switch_mode('projects')", "Projects"),
         ("m", "switch_mode('monthly_summary')", "Monthly Summary"),
+        ("t", "toggle_stats", "Query Stats"),
     ]
     CSS_PATH = [
+        "tcss/expenses.tcss",
         "tcss/finances.tcss",
         "tcss/monthly_summary.tcss",
         "tcss/projects.tcss",
+        "tcss/stats.tcss",
         "tcss/work_schedule.tcss",
     ]
     MODES = {
         "main": MainScreen,
-        "work_schedule": WorkScheduleScreen,
-        "finances": FinancesScreen,
-        "expenses": ExpensesScreen,
-        "projects": ProjectsScreen,
-        "monthly_summary": MonthlySummaryScreen,
+        "work_schedule": lazy_screen("screens.work_schedule", "WorkScheduleScreen"),
+        "finances": lazy_screen("screens.finances", "FinancesScreen"),
+        "expenses": lazy_screen("screens.expenses", "ExpensesScreen"),
+        "projects": lazy_screen("screens.projects", "ProjectsScreen"),
+        "monthly_summary": lazy_screen("screens.monthly_summary", "MonthlySummaryScreen"),
     }
 
+    def __init__(
+            self,
+            db_path: str = "db/calendar.db",
+            write_behind: bool = True,
+            db_profile: Optional[str] = None,
+            withholding: Optional[WithholdingConfig] = None,
+            **kwargs
+        ) -> None:
+        """
+        Pass write_behind=False to commit every calendar change as it happens. db_profile names
+        one of connection_profile.PROFILES, defaulting to $TIMEWIZARD_DB_PROFILE or "default".
+        withholding holds the tax tables and deductions take-home pay is worked out with.
+        """
+        super().__init__(**kwargs)
+        profile = PROFILES[db_profile or os.environ.get("TIMEWIZARD_DB_PROFILE", "default")]
+        self.databases = DatabaseRegistry(db_path, write_behind=write_behind, profile=profile)
+        self.withholding = withholding if withholding is not None else DEFAULT_WITHHOLDING
+        # Publishes (db_path, CalendarChanges) when another instance changes an open db.
+        self.calendar_changed_signal: Signal[tuple[str, CalendarChanges]] = Signal(self, "calendar-changed")
+
     def action_switch_mode_or_quit(self) -> None:
         """If user on the main screen, exit, else go back to main screen."""
         if self.current_mode == "main":
@@ -69,11 +111,31 @@ class TimeWizardApp(App):
         else:
             self.switch_mode("main")
 
+    def action_toggle_stats(self) -> None:
+        """Shows the query stats overlay, or closes it if already open."""
+        from screens.stats import StatsScreen
+
+        if isinstance(self.screen, StatsScreen):
+            self.pop_screen()
+        else:
+            self.push_screen(StatsScreen())
+
     def on_mount(self) -> None:
         self.theme = "catppuccin-mocha"
         self.title = "TIMEWIZARD"
         self.sub_title = "Yer an' adult Harry!"
         self.switch_mode("main")
+        self.set_interval(FLUSH_INTERVAL_SECONDS, self.databases.flush_all)
+        self.set_interval(CHANGE_POLL_INTERVAL_SECONDS, self.poll_database_changes)
+
+    async def poll_database_changes(self) -> None:
+        """Tells subscribers which months another instance changed."""
+        for db_path, changes in (await self.databases.poll_changes()).items():
+            self.calendar_changed_signal.publish((db_path, changes))
+
+    def on_unmount(self) -> None:
+        """Closes the shared db connections on exit."""
+        self.databases.close_all()
 
 
 if __name__ == "__main__":
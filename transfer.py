@@ -0,0 +1,301 @@
+import csv
+import json
+import re
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Optional
+
+from database_manager import TRANSFER_COLUMNS, DatabaseManager
+from migrations import DEFAULT_SHIFT_START
+from payroll import SHIFT_HOURS
+
+FORMATS = ("csv", "jsonl", "ics")
+# iCalendar files only describe events, so they carry shifts and nothing else.
+ICS_TABLES = ("shifts",)
+BOOL_COLUMNS = {"is_working", "is_overtime", "is_night", "is_critical", "daily", "weekly", "biweekly", "monthly"}
+FLOAT_COLUMNS = {"hourly_rate", "overtime_rate", "weekend_rate", "night_rate", "critical_rate", "amount"}
+INT_COLUMNS = {"id", "day"}
+DATE_COLUMNS = {"date_string", "start_date", "end_date"}
+TIME_COLUMNS = {"start_time", "end_time"}
+# Columns a row can't be imported without.
+REQUIRED_COLUMNS = {
+    "calendar": ("date_string",),
+    "jobs": TRANSFER_COLUMNS["jobs"],
+    "expenses": ("name", "amount", "start_date"),
+    "shifts": ("job_name", "start_time", "end_time"),
+}
+SHIFT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+ICS_TIME_FORMAT = "%Y%m%dT%H%M%S"
+# Escaped characters of ics TEXT values, read in one left to right pass so an escaped backslash
+# followed by n stays a backslash and an n.
+ICS_ESCAPES = {"n": "\n", "N": "\n", ",": ",", ";": ";", "\\": "\\"}
+ICS_ESCAPE_PATTERN = re.compile(r"\\(.)")
+TRUE_STRINGS = {"1", "true", "yes", "y", "t"}
+FALSE_STRINGS = {"0", "false", "no", "n", "f", ""}
+
+
+def format_for(path: str, fmt: Optional[str] = None) -> str:
+    """The given format, or the one named by path's suffix."""
+    fmt = (fmt or Path(path).suffix.lstrip(".")).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown file format {fmt!r}, expected one of {FORMATS}")
+    return fmt
+
+
+def check_format(table: str, fmt: str) -> None:
+    if table not in TRANSFER_COLUMNS:
+        raise ValueError(f"Unknown table {table!r}, expected one of {tuple(TRANSFER_COLUMNS)}")
+    if fmt == "ics" and table not in ICS_TABLES:
+        raise ValueError(f"Only {ICS_TABLES} can be written as ics, not {table!r}")
+
+
+@contextmanager
+def open_stream(path: str, mode: str) -> Iterator[IO[str]]:
+    """Opens path as text for streaming, with '-' meaning stdin or stdout."""
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+        return
+    with open(path, mode, newline="", encoding="utf-8") as file:
+        yield file
+
+
+def export_table(db_manager: DatabaseManager, table: str, path: str, fmt: Optional[str] = None) -> int:
+    """Streams every row of table to path. Returns the number of rows written."""
+    fmt = format_for(path, fmt)
+    check_format(table, fmt)
+    with open_stream(path, "w") as file:
+        return write_rows(table, db_manager.export_rows(table), file, fmt)
+
+
+def import_table(
+        db_manager: DatabaseManager,
+        table: str,
+        path: str,
+        fmt: Optional[str] = None,
+        job_name: Optional[str] = None
+    ) -> int:
+    """
+    Streams the rows of path into table in one transaction. Shifts with no job column, and every
+    shift of an ics file not exported from here, go to job_name or else the default job. Returns
+    the number of rows imported. Any bad row raises, leaving the table untouched.
+    """
+    fmt = format_for(path, fmt)
+    check_format(table, fmt)
+    with open_stream(path, "r") as file:
+        return db_manager.import_rows(table, read_rows(table, file, fmt, job_name or db_manager.DEFAULT_JOB_NAME))
+
+
+def write_rows(table: str, rows: Iterable[Any], file: IO[str], fmt: str) -> int:
+    """Writes rows holding TRANSFER_COLUMNS as they arrive. Returns the number written."""
+    columns = TRANSFER_COLUMNS[table]
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(tuple(row))
+            count += 1
+    elif fmt == "jsonl":
+        for row in rows:
+            record = {
+                column: bool(value) if column in BOOL_COLUMNS and value is not None else value
+                for column, value in zip(columns, row)
+            }
+            file.write(json.dumps(record) + "\n")
+            count += 1
+    else:
+        count = write_ics(rows, file)
+    return count
+
+
+def read_rows(table: str, file: IO[str], fmt: str, job_name: str) -> Iterator[dict[str, Any]]:
+    """Lazily yields the rows of file converted to column types, one line at a time."""
+    if fmt == "csv":
+        records = csv.DictReader(file)
+    elif fmt == "jsonl":
+        records = (json.loads(line) for line in file if line.strip())
+    else:
+        records = read_ics(file, job_name)
+    for number, record in enumerate(records, start=1):
+        if table == "shifts" and not record.get("job_name"):
+            record["job_name"] = job_name
+        try:
+            yield convert_row(table, record)
+        except ValueError as error:
+            raise ValueError(f"Row {number} of {table}: {error}") from None
+
+
+def convert_row(table: str, record: dict[str, Any]) -> dict[str, Any]:
+    """Keeps the table's columns from a parsed record, converting each to the type stored."""
+    row = {}
+    for column in TRANSFER_COLUMNS[table]:
+        value = record.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            row[column] = None
+            continue
+        if column in BOOL_COLUMNS:
+            row[column] = int(parse_bool(value))
+        elif column in FLOAT_COLUMNS:
+            row[column] = float(value)
+        elif column in INT_COLUMNS:
+            row[column] = int(value)
+        elif column in DATE_COLUMNS:
+            row[column] = date.fromisoformat(str(value)).isoformat()
+        elif column in TIME_COLUMNS:
+            row[column] = datetime.fromisoformat(str(value)).strftime(SHIFT_TIME_FORMAT)
+        else:
+            row[column] = value
+    missing = [column for column in REQUIRED_COLUMNS[table] if row[column] is None]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    if table == "expenses":
+        for column in ("daily", "weekly", "biweekly", "monthly"):
+            row[column] = row[column] or 0
+    if table == "shifts" and row["end_time"] <= row["start_time"]:
+        raise ValueError(f"shift ends at {row['end_time']}, before it starts")
+    return row
+
+
+def parse_bool(value: Any) -> bool:
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in TRUE_STRINGS:
+        return True
+    if text in FALSE_STRINGS:
+        return False
+    raise ValueError(f"{value!r} is not a yes or no value")
+
+
+def write_ics(shifts: Iterable[Any], file: IO[str]) -> int:
+    """Writes (job_name, start_time, end_time, is_night, is_critical) shifts as VEVENTs."""
+    stamp = datetime.now(timezone.utc).strftime(ICS_TIME_FORMAT) + "Z"
+    lines = ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//timewizard//shifts//EN", "CALSCALE:GREGORIAN")
+    file.write("\r\n".join(lines) + "\r\n")
+    count = 0
+    for job_name, start_time, end_time, is_night, is_critical in shifts:
+        start = datetime.strptime(start_time, SHIFT_TIME_FORMAT)
+        end = datetime.strptime(end_time, SHIFT_TIME_FORMAT)
+        categories = [name for name, flag in (("NIGHT", is_night), ("CRITICAL", is_critical)) if flag]
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{start:{ICS_TIME_FORMAT}}-{escape_ics_text(job_name)}@timewizard",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start:{ICS_TIME_FORMAT}}",
+            f"DTEND:{end:{ICS_TIME_FORMAT}}",
+            f"SUMMARY:{escape_ics_text(job_name)}",
+            f"X-TIMEWIZARD-JOB:{escape_ics_text(job_name)}",
+        ]
+        if categories:
+            lines.append(f"CATEGORIES:{','.join(categories)}")
+        lines.append("END:VEVENT")
+        file.write("\r\n".join(lines) + "\r\n")
+        count += 1
+    file.write("END:VCALENDAR\r\n")
+    return count
+
+
+def read_ics(file: IO[str], job_name: str) -> Iterator[dict[str, Any]]:
+    """
+    Yields a shift for every VEVENT in an iCalendar file. Times in UTC are converted to local
+    time and times with a TZID are taken as the wall clock time given. All-day events become a
+    default shift. Cancelled events are skipped, and CATEGORIES of NIGHT or CRITICAL set the
+    matching flag.
+    """
+    event: Optional[dict[str, tuple[dict[str, str], str]]] = None
+    for line in unfold_ics(file):
+        name, params, value = parse_ics_line(line)
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.upper() == "VEVENT":
+            if event is not None and event.get("STATUS", ({}, ""))[1].upper() != "CANCELLED":
+                yield ics_shift(event, job_name)
+            event = None
+        elif event is not None:
+            event[name] = (params, value)
+
+
+def ics_shift(event: dict[str, tuple[dict[str, str], str]], job_name: str) -> dict[str, Any]:
+    if "DTSTART" not in event:
+        raise ValueError("VEVENT has no DTSTART")
+    start, all_day = parse_ics_time(*event["DTSTART"])
+    if all_day:
+        start = datetime.combine(start.date(), datetime.strptime(DEFAULT_SHIFT_START, "%H:%M:%S").time())
+        end = start + timedelta(hours=SHIFT_HOURS)
+    elif "DTEND" in event:
+        end = parse_ics_time(*event["DTEND"])[0]
+    elif "DURATION" in event:
+        end = start + parse_ics_duration(event["DURATION"][1])
+    else:
+        end = start + timedelta(hours=SHIFT_HOURS)
+    categories = {
+        category.strip().upper() for category in event.get("CATEGORIES", ({}, ""))[1].split(",")
+    }
+    job = event.get("X-TIMEWIZARD-JOB")
+    return {
+        "job_name": unescape_ics_text(job[1]) if job else job_name,
+        "start_time": start.strftime(SHIFT_TIME_FORMAT),
+        "end_time": end.strftime(SHIFT_TIME_FORMAT),
+        "is_night": "NIGHT" in categories,
+        "is_critical": "CRITICAL" in categories,
+    }
+
+
+def unfold_ics(file: IO[str]) -> Iterator[str]:
+    """Yields logical lines, joining the continuation lines that start with a space or tab."""
+    current = None
+    for raw_line in file:
+        line = raw_line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_ics_line(line: str) -> tuple[str, dict[str, str], str]:
+    """Splits 'NAME;PARAM=VALUE:value' into its name, parameters and value."""
+    head, _, value = line.partition(":")
+    name, *params = head.split(";")
+    return name.upper(), dict(param.partition("=")[::2] for param in params), value
+
+
+def parse_ics_time(params: dict[str, str], value: str) -> tuple[datetime, bool]:
+    """A DTSTART or DTEND as a naive local datetime, and whether it is a whole day."""
+    if params.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d"), True
+    if value.endswith("Z"):
+        utc = datetime.strptime(value[:-1], ICS_TIME_FORMAT).replace(tzinfo=timezone.utc)
+        return utc.astimezone().replace(tzinfo=None), False
+    return datetime.strptime(value, ICS_TIME_FORMAT), False
+
+
+def parse_ics_duration(value: str) -> timedelta:
+    """A DURATION such as PT12H, P1D or PT7H30M."""
+    sign = -1 if value.startswith("-") else 1
+    amounts = {"W": 0, "D": 0, "H": 0, "M": 0, "S": 0}
+    number = ""
+    for char in value.lstrip("+-").removeprefix("P"):
+        if char.isdigit():
+            number += char
+        elif char in amounts:
+            amounts[char] = int(number or 0)
+            number = ""
+    return sign * timedelta(
+        weeks=amounts["W"], days=amounts["D"], hours=amounts["H"], minutes=amounts["M"], seconds=amounts["S"]
+    )
+
+
+def escape_ics_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def unescape_ics_text(text: str) -> str:
+    return ICS_ESCAPE_PATTERN.sub(lambda match: ICS_ESCAPES.get(match[1], match[0]), text)
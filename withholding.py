@@ -0,0 +1,238 @@
+import functools
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Iterable, Mapping, NamedTuple, Optional
+
+from earnings_index import FenwickTree
+
+# How many pay periods a year the annualized tables assume for each pay cadence.
+PERIODS_PER_YEAR = {
+    "weekly": 52,
+    "biweekly": 26,
+    "semimonthly": 24,
+    "monthly": 12,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Bracket:
+    """Income above floor, up to the next bracket's floor, is taxed at rate."""
+    floor: float
+    rate: float
+
+
+@dataclass(frozen=True, slots=True)
+class Deduction:
+    """
+    Taken out of each paycheck before income tax: a fixed amount plus a share of gross, such as a
+    health premium or a 401(k) contribution. Cafeteria plan deductions also lower the wages FICA
+    is charged on, retirement contributions don't.
+    """
+    name: str
+    amount: float = 0.0
+    rate: float = 0.0
+    reduces_fica: bool = False
+
+    def per_period(self, gross: float) -> float:
+        return min(gross, self.amount + gross * self.rate)
+
+
+@dataclass(frozen=True, slots=True)
+class WithholdingConfig:
+    """
+    Annual tax tables and payroll rates for the annualized percentage method. federal_brackets
+    already allow for the standard deduction, as in the employer tables. state_deduction is
+    taken off annual wages before the state brackets.
+    """
+    federal_brackets: tuple[Bracket, ...]
+    state_brackets: tuple[Bracket, ...]
+    state_deduction: float = 0.0
+    social_security_rate: float = 0.062
+    social_security_wage_base: float = 176_100.0
+    medicare_rate: float = 0.0145
+    additional_medicare_rate: float = 0.009
+    additional_medicare_threshold: float = 200_000.0
+    pretax_deductions: tuple[Deduction, ...] = field(default=())
+
+
+class Withholding(NamedTuple):
+    """One paycheck split from gross to take-home pay."""
+    gross: float = 0.0
+    pretax: float = 0.0
+    federal: float = 0.0
+    state: float = 0.0
+    social_security: float = 0.0
+    medicare: float = 0.0
+
+    @property
+    def taxes(self) -> float:
+        return self.federal + self.state + self.social_security + self.medicare
+
+    @property
+    def net(self) -> float:
+        return self.gross - self.pretax - self.taxes
+
+    def __add__(self, other: "Withholding") -> "Withholding":
+        return Withholding(*(mine + theirs for mine, theirs in zip(self, other)))
+
+
+class TaxTable:
+    """
+    Progressive brackets compiled once into sorted floors, rates and the tax owed at each
+    floor, so the tax on any income is a binary search and one multiply.
+    """
+
+    def __init__(self, brackets: Iterable[Bracket]) -> None:
+        brackets = sorted(brackets, key=lambda bracket: bracket.floor)
+        if not brackets or brackets[0].floor > 0:
+            brackets.insert(0, Bracket(0.0, 0.0))
+        self._floors = [bracket.floor for bracket in brackets]
+        self._rates = [bracket.rate for bracket in brackets]
+        self._base = [0.0]
+        for (floor, rate), next_floor in zip(zip(self._floors, self._rates), self._floors[1:]):
+            self._base.append(self._base[-1] + (next_floor - floor) * rate)
+
+    def tax(self, income: float) -> float:
+        if income <= 0:
+            return 0.0
+        index = bisect_right(self._floors, income) - 1
+        return self._base[index] + (income - self._floors[index]) * self._rates[index]
+
+
+class WithholdingEngine:
+    """
+    Withholding for one paycheck by the annualized percentage method: pay after pre-tax
+    deductions is scaled up to a year, taxed on the compiled tables and scaled back down. Social
+    security stops at its wage base and additional medicare starts past its threshold, both
+    judged from the year's earlier wages. Income tax depends on the paycheck alone, so it is
+    memoized per gross amount.
+    """
+
+    def __init__(self, config: WithholdingConfig, periods_per_year: int = PERIODS_PER_YEAR["biweekly"]) -> None:
+        self.config = config
+        self.periods_per_year = periods_per_year
+        self.federal = TaxTable(config.federal_brackets)
+        self.state = TaxTable(config.state_brackets)
+        self._income_taxes: dict[float, tuple[float, float, float, float]] = {}
+
+    def withhold(self, gross: float, ytd_fica_wages: float = 0.0) -> Withholding:
+        """Splits one paycheck, given the FICA wages paid earlier in the year."""
+        config = self.config
+        income_taxes = self._income_taxes.get(gross)
+        if income_taxes is None:
+            income_taxes = self._income_taxes[gross] = self._income_tax(gross)
+        pretax, fica_wages, federal, state = income_taxes
+
+        social_security_wages = max(0.0, min(fica_wages, config.social_security_wage_base - ytd_fica_wages))
+        over_threshold = max(
+            0.0, ytd_fica_wages + fica_wages - max(config.additional_medicare_threshold, ytd_fica_wages)
+        )
+        return Withholding(
+            gross=gross,
+            pretax=pretax,
+            federal=federal,
+            state=state,
+            social_security=social_security_wages * config.social_security_rate,
+            medicare=fica_wages * config.medicare_rate + over_threshold * config.additional_medicare_rate,
+        )
+
+    def _income_tax(self, gross: float) -> tuple[float, float, float, float]:
+        """(pre-tax deductions, FICA wages, federal, state) for a paycheck."""
+        config = self.config
+        pretax = min(gross, sum((deduction.per_period(gross) for deduction in config.pretax_deductions), 0.0))
+        annual = (gross - pretax) * self.periods_per_year
+        return (
+            pretax,
+            self.fica_wages(gross),
+            self.federal.tax(annual) / self.periods_per_year,
+            self.state.tax(annual - config.state_deduction) / self.periods_per_year,
+        )
+
+    def fica_wages(self, gross: float) -> float:
+        """Gross less the deductions exempt from FICA."""
+        return gross - sum(
+            deduction.per_period(gross) for deduction in self.config.pretax_deductions if deduction.reduces_fica
+        )
+
+
+@functools.cache
+def withholding_engine(config: WithholdingConfig, periods_per_year: int) -> WithholdingEngine:
+    """A shared engine per config and cadence, so its compiled tables and memo are reused."""
+    return WithholdingEngine(config, periods_per_year)
+
+
+class PayLedger:
+    """
+    Gross pay for every payday of one year, kept as Fenwick prefix sums so the FICA wages paid
+    before any payday cost O(log n). Changing one paycheck is an O(log n) update, and each
+    payday's withholding is cached until its own gross or the wages before it change, so a
+    toggle only recomputes the paydays that are read again.
+    """
+
+    def __init__(self, engine: WithholdingEngine, pay_days: Iterable[date], gross: Optional[dict[date, float]] = None) -> None:
+        self.engine = engine
+        self.pay_days = sorted(pay_days)
+        self._positions = {pay_day: position for position, pay_day in enumerate(self.pay_days)}
+        gross = gross or {}
+        self._gross = [gross.get(pay_day, 0.0) for pay_day in self.pay_days]
+        self._fica_wages = FenwickTree.from_values(engine.fica_wages(amount) for amount in self._gross)
+        self._cache: dict[date, tuple[float, float, Withholding]] = {}
+
+    @classmethod
+    def from_summaries(cls, engine: WithholdingEngine, pay_days: Iterable[date], summaries: Mapping[str, Any]) -> "PayLedger":
+        """Builds a ledger from period pay summaries keyed by payday, as get_summaries returns them."""
+        return cls(engine, pay_days, {date.fromisoformat(key): summary.gross for key, summary in summaries.items()})
+
+    def __contains__(self, pay_day: date) -> bool:
+        return pay_day in self._positions
+
+    def gross(self, pay_day: date) -> float:
+        return self._gross[self._positions[pay_day]]
+
+    def set_gross(self, pay_day: date, gross: float) -> None:
+        position = self._positions[pay_day]
+        old = self._gross[position]
+        if old == gross:
+            return
+        self._gross[position] = gross
+        self._fica_wages.add(position, self.engine.fica_wages(gross) - self.engine.fica_wages(old))
+
+    def ytd_fica_wages(self, pay_day: date) -> float:
+        """FICA wages paid earlier in the year than pay_day."""
+        position = self._positions[pay_day]
+        return self._fica_wages.prefix_sum(position - 1) if position > 0 else 0.0
+
+    def withholding(self, pay_day: date) -> Withholding:
+        gross = self.gross(pay_day)
+        ytd = self.ytd_fica_wages(pay_day)
+        cached = self._cache.get(pay_day)
+        if cached is not None and cached[0] == gross and cached[1] == ytd:
+            return cached[2]
+        result = self.engine.withhold(gross, ytd)
+        self._cache[pay_day] = (gross, ytd, result)
+        return result
+
+    def total(self, pay_days: Iterable[date]) -> Withholding:
+        total = Withholding()
+        for pay_day in pay_days:
+            total += self.withholding(pay_day)
+        return total
+
+
+# 2025 annual tables for a single filer: the federal percentage method table for standard
+# withholding and North Carolina's flat rate after its standard deduction.
+DEFAULT_WITHHOLDING = WithholdingConfig(
+    federal_brackets=(
+        Bracket(0.0, 0.0),
+        Bracket(6_400.0, 0.10),
+        Bracket(18_325.0, 0.12),
+        Bracket(54_875.0, 0.22),
+        Bracket(109_750.0, 0.24),
+        Bracket(203_700.0, 0.32),
+        Bracket(256_925.0, 0.35),
+        Bracket(632_750.0, 0.37),
+    ),
+    state_brackets=(Bracket(0.0, 0.0425),),
+    state_deduction=12_750.0,
+)